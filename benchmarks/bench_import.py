@@ -0,0 +1,82 @@
+# SPDX-License-Identifier: Apache-2.0
+
+#!/usr/bin/env python3
+"""
+Measure the import cost of the package and the CLI.
+
+Each case is imported in a fresh interpreter with -X importtime, which reports the
+cumulative import time of the top-level module and the modules it loaded. The run
+exits with status 1 when a case exceeds --budget-ms, or when importing the models
+alone loads lxml, xmltodict or the Fedwire machinery.
+
+Usage:
+    python benchmarks/bench_import.py [--budget-ms 60] [--repeat 5]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+REPO_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+CASES = [
+    ("package", "import miso20022"),
+    ("models", "from miso20022.common import PstlAdr"),
+    ("cli", "import miso20022.cli"),
+]
+
+# Modules that only generation/parsing needs
+HEAVY_MODULES = ("lxml", "xmltodict", "miso20022.fedwire", "miso20022.helpers")
+
+
+def import_profile(statement):
+    """Return (cumulative microseconds of the miso20022 imports, set of loaded module names) for one run."""
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            env=env, capture_output=True, text=True, check=True)
+    cumulative = 0
+    loaded = set()
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Top-level entries (one space after the bar) already include their dependencies
+        if name.startswith(" miso20022"):
+            cumulative += int(cumulative_us)
+        loaded.add(name.strip())
+    return cumulative, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the import time of miso20022 and its CLI.')
+    parser.add_argument('--budget-ms', type=float, default=60.0, help='Allowed cumulative import time per case.')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case; the fastest is reported.')
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'case':<10} {'import_ms':>10}  heavy modules loaded")
+    for name, statement in CASES:
+        runs = [import_profile(statement) for _ in range(args.repeat)]
+        best_us = min(cumulative for cumulative, _ in runs)
+        heavy = sorted(m for m in HEAVY_MODULES if m in runs[0][1])
+        print(f"{name:<10} {best_us / 1000:>10.1f}  {', '.join(heavy) or '-'}")
+
+        if best_us / 1000 > args.budget_ms:
+            failures.append(f"{name}: {best_us / 1000:.1f}ms exceeds the {args.budget_ms:.0f}ms budget")
+        if heavy and name != "cli":
+            failures.append(f"{name}: loads {', '.join(heavy)}")
+        elif name == "cli" and any(m in runs[0][1] for m in ("lxml", "miso20022.fedwire")):
+            failures.append("cli: loads the Fedwire machinery before a command runs")
+
+    if failures:
+        print("\nImport budget exceeded:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print(f"\nAll cases within {args.budget_ms:.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
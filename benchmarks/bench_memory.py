@@ -0,0 +1,72 @@
+# SPDX-License-Identifier: Apache-2.0
+
+#!/usr/bin/env python3
+"""
+Measure the memory held by the message models per message.
+
+Builds pacs.008 Documents from synthetic payloads and parses pacs.008 messages back
+into (GrpHdr, CdtTrfTxInf) pairs, keeps them all alive, and reports the traced
+allocation per message and the number of model objects it involves.
+
+Usage:
+    python benchmarks/bench_memory.py [--messages N]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tracemalloc
+from dataclasses import fields, is_dataclass
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCHMARKS_DIR, '..')))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import payloads
+from miso20022.helpers import parse_xml_to_dict
+from miso20022.pacs.pacs008 import Document, FIToFICstmrCdtTrf
+
+
+def count_models(obj):
+    """Count the dataclass instances reachable from obj."""
+    if is_dataclass(obj):
+        return 1 + sum(count_models(getattr(obj, field.name)) for field in fields(obj))
+    if isinstance(obj, (list, tuple)):
+        return sum(count_models(item) for item in obj)
+    if isinstance(obj, dict):
+        return sum(count_models(item) for item in obj.values())
+    return 0
+
+
+def measure(build, inputs):
+    """Return (bytes per message, the built objects) for build applied to every input."""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    built = [build(item) for item in inputs]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    held = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    return held / len(inputs), built
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the per-message memory footprint of the models.')
+    parser.add_argument('--messages', type=int, default=2000, help='Messages to hold in memory.')
+    args = parser.parse_args()
+
+    payload_list = payloads.pacs008_payloads(args.messages)
+    with contextlib.redirect_stdout(io.StringIO()):
+        data_list = [parse_xml_to_dict(message) for message in payloads.pacs008_messages(args.messages)]
+
+    per_document, documents = measure(Document.from_payload, payload_list)
+    per_parsed, parsed = measure(FIToFICstmrCdtTrf.from_iso20022, data_list)
+
+    print(f"{'case':<28} {'objects/msg':>12} {'bytes/msg':>10}")
+    print(f"{'pacs.008 Document (build)':<28} {count_models(documents[0]):>12} {per_document:>10.0f}")
+    print(f"{'pacs.008 CdtTrfTxInf (parse)':<28} {count_models(parsed[0]):>12} {per_parsed:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# SPDX-License-Identifier: Apache-2.0
+
+#!/usr/bin/env python3
+"""
+Compare the dictionary-based serializer (to_dict + dict_to_xml) with the direct
+dataclass-to-lxml serializer (to_element + element_to_xml).
+
+Usage:
+    python benchmarks/bench_serialization.py [--number N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from miso20022.bah.apphdr import AppHdr
+from miso20022.helpers import dict_to_xml, element_to_xml
+from miso20022.pacs.pacs008 import Document as Pacs008Document
+from miso20022.pacs.pacs028 import Document as Pacs028Document
+
+PACS008 = "urn:iso:std:iso:20022:tech:xsd:pacs.008.001.08"
+PACS028 = "urn:iso:std:iso:20022:tech:xsd:pacs.028.001.03"
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sample_files')
+
+
+def load_sample(name):
+    with open(os.path.join(SAMPLES_DIR, name), 'r') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark XML serialization of the message models.')
+    parser.add_argument('--number', type=int, default=2000, help='Iterations per measurement.')
+    args = parser.parse_args()
+
+    pacs008_payload = load_sample('sample_payload.json')
+    pacs028_payload = load_sample('sample_pacs028_payload.json')
+
+    models = [
+        ("AppHdr", AppHdr.from_payload("TEST", "000000008", PACS008, pacs008_payload),
+         "head", "urn:iso:std:iso:20022:tech:xsd:head.001.001.03"),
+        ("pacs.008", Pacs008Document.from_payload(pacs008_payload), "pacs", PACS008),
+        ("pacs.028", Pacs028Document.from_payload(pacs028_payload), "pacs", PACS028),
+    ]
+
+    print(f"{'model':<10} {'dict_to_xml (us)':>18} {'element_to_xml (us)':>20} {'speedup':>8}")
+    for name, model, prefix, namespace in models:
+        legacy = lambda: dict_to_xml(model.to_dict(), prefix, namespace)
+        direct = lambda: element_to_xml(model.to_element())
+
+        if legacy() != direct():
+            print(f"{name}: outputs differ", file=sys.stderr)
+            sys.exit(1)
+
+        legacy_us = timeit.timeit(legacy, number=args.number) / args.number * 1e6
+        direct_us = timeit.timeit(direct, number=args.number) / args.number * 1e6
+        print(f"{name:<10} {legacy_us:>18.1f} {direct_us:>20.1f} {legacy_us / direct_us:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# SPDX-License-Identifier: Apache-2.0
+
+#!/usr/bin/env python3
+"""
+Check that multi-transaction pacs.008 messages parse back into their payloads.
+
+For each transaction count, a bulk message is generated from synthetic payloads that
+share one message ID and pair of institutions, then parsed with
+generate_fedwire_payload, iter_fedwire_payloads and the dictionary path. Each must
+give one payload per transaction, equal to the payload parsed from a
+single-transaction message built from the same input. The run exits with status 1
+when any path differs.
+
+Usage:
+    python benchmarks/check_roundtrip.py [--transactions 1 2 5]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCHMARKS_DIR, '..')))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import payloads
+
+
+def roundtrip_failures(count):
+    """Return the paths whose payloads differ from the expected ones for a bulk message of count transactions."""
+    from miso20022.fedwire import (fedwire_payload_from_dict, generate_fedwire_bulk_message, generate_fedwire_message,
+                                   generate_fedwire_payload, iter_fedwire_payloads)
+    from miso20022.helpers import parse_xml_to_dict
+
+    payload_list = payloads.pacs008_payloads(count)
+    # The transactions of a bulk message share its message ID and its sender and receiver
+    first = payload_list[0]["fedWireMessage"]
+    for payload in payload_list[1:]:
+        msg = payload["fedWireMessage"]
+        msg["inputMessageAccountabilityData"] = dict(first["inputMessageAccountabilityData"])
+        msg["senderDepositoryInstitution"]["senderABANumber"] = first["senderDepositoryInstitution"]["senderABANumber"]
+        msg["receiverDepositoryInstitution"]["receiverABANumber"] = first["receiverDepositoryInstitution"]["receiverABANumber"]
+
+    # The library reports progress with print(); keep it out of the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = []
+        for payload in payload_list:
+            _, _, message = generate_fedwire_message(payloads.PACS008, payloads.ENVIRONMENT, payloads.FED_ABA,
+                                                     payload, payloads.ENVELOPE_XSD)
+            expected.append(generate_fedwire_payload(message, payloads.PACS008))
+        _, _, bulk = generate_fedwire_bulk_message(payloads.PACS008, payloads.ENVIRONMENT, payloads.FED_ABA,
+                                                   payload_list, payloads.ENVELOPE_XSD)
+    if bulk is None:
+        return ["generate_fedwire_bulk_message"]
+    bulk = bulk.encode('utf-8')
+
+    # A single transaction gives a payload; several give a list of them
+    parsed = generate_fedwire_payload(bulk, payloads.PACS008)
+    mapped = fedwire_payload_from_dict(parse_xml_to_dict(bulk), payloads.PACS008)
+    results = {
+        "generate_fedwire_payload": parsed if isinstance(parsed, list) else [parsed],
+        "iter_fedwire_payloads": list(iter_fedwire_payloads(io.BytesIO(bulk))),
+        "fedwire_payload_from_dict": mapped if isinstance(mapped, list) else [mapped],
+    }
+    return [path for path, result in results.items() if result != expected]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the generate/parse round trip of bulk pacs.008 messages.')
+    parser.add_argument('--transactions', type=int, nargs='+', default=[1, 2, 5],
+                        help='Transaction counts of the bulk messages to check.')
+    args = parser.parse_args()
+
+    failures = []
+    for count in args.transactions:
+        try:
+            paths = roundtrip_failures(count)
+        except ValueError as e:
+            paths = [f"error: {e}"]
+        print(f"{count:>3} transactions  {'ok' if not paths else ', '.join(paths)}")
+        failures.extend(f"{count} transactions: {path}" for path in paths)
+
+    if failures:
+        print("\nRound trip failed:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nAll round trips match")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Synthetic payloads and messages for the benchmarks, derived from sample_files/.
+
+Every generator is seeded so repeated runs measure the same inputs.
+"""
+
+import copy
+import json
+import os
+import random
+from string import ascii_uppercase, digits
+
+from lxml import etree
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLES_DIR = os.path.join(BENCHMARKS_DIR, '..', 'sample_files')
+ENVELOPE_XSD = os.path.join(BENCHMARKS_DIR, 'envelope.xsd')
+
+PACS008 = "urn:iso:std:iso:20022:tech:xsd:pacs.008.001.08"
+PACS028 = "urn:iso:std:iso:20022:tech:xsd:pacs.028.001.03"
+PACS002 = "urn:iso:std:iso:20022:tech:xsd:pacs.002.001.10"
+
+ENVIRONMENT = "TEST"
+FED_ABA = "000000008"
+
+_STREETS = ["MAIN STREET", "OAK AVENUE", "PINE ROAD", "MARKET ST", "HARBOR BLVD", "LAKE DRIVE"]
+_TOWNS = ["ANYTOWN, TX 12345", "SOMEWHERE, CA 67890", "SEATTLE, WA 98101", "BOSTON, MA 02110"]
+_NAMES = ["JANE SMITH", "JOHN DOE", "ACME SUPPLY CO", "NORTHWIND TRADERS LLC", "MARIA GARCIA"]
+
+
+def _load_sample(name):
+    with open(os.path.join(SAMPLES_DIR, name), 'r') as f:
+        return json.load(f)
+
+
+def _code(rng, length, alphabet=digits):
+    return ''.join(rng.choice(alphabet) for _ in range(length))
+
+
+def _party(rng):
+    return {
+        "name": rng.choice(_NAMES),
+        "address": {
+            "addressLineOne": f"{rng.randint(1, 9999)} {rng.choice(_STREETS)}",
+            "addressLineTwo": rng.choice(_TOWNS),
+            "addressLineThree": rng.choice(["", "SUITE 100", "FLOOR 2"]),
+        },
+        "identifier": _code(rng, rng.randint(8, 17)),
+    }
+
+
+def pacs008_payloads(count, seed=8):
+    """Return count pacs.008 payloads shaped like sample_files/sample_payload.json."""
+    rng = random.Random(seed)
+    template = _load_sample('sample_payload.json')
+    payloads = []
+    for i in range(count):
+        payload = copy.deepcopy(template)
+        msg = payload["fedWireMessage"]
+        msg["inputMessageAccountabilityData"]["inputSequenceNumber"] = f"{i:09d}"
+        msg["amount"]["amount"] = str(rng.randint(100, 100_000_000))
+        msg["senderDepositoryInstitution"]["senderABANumber"] = _code(rng, 9)
+        msg["receiverDepositoryInstitution"]["receiverABANumber"] = _code(rng, 9)
+        msg["originator"]["personal"] = _party(rng)
+        msg["beneficiary"]["personal"] = _party(rng)
+        payloads.append(payload)
+    return payloads
+
+
+def pacs028_payloads(count, seed=28):
+    """Return count pacs.028 payloads shaped like sample_files/sample_pacs028_payload.json."""
+    rng = random.Random(seed)
+    template = _load_sample('sample_pacs028_payload.json')
+    payloads = []
+    for i in range(count):
+        payload = copy.deepcopy(template)
+        msg = payload["fedWireMessage"]
+        msg["inputMessageAccountabilityData"]["inputSequenceNumber"] = f"{i:09d}"
+        msg["senderDepositoryInstitution"]["senderABANumber"] = _code(rng, 9)
+        msg["receiverDepositoryInstitution"]["receiverABANumber"] = _code(rng, 9)
+        payload["original_msg_id"] = f"20250109MBANQ{_code(rng, 9)}"
+        payload["original_end_to_end_id"] = "MEtoEID" + _code(rng, 8, ascii_uppercase + digits)
+        payloads.append(payload)
+    return payloads
+
+
+def pacs008_messages(count, seed=8):
+    """Return count complete pacs.008 messages (bytes) generated from synthetic payloads."""
+    from miso20022.fedwire import generate_fedwire_message
+
+    messages = []
+    for payload in pacs008_payloads(count, seed):
+        _, _, complete_message = generate_fedwire_message(PACS008, ENVIRONMENT, FED_ABA, payload, ENVELOPE_XSD)
+        messages.append(complete_message.encode('utf-8'))
+    return messages
+
+
+def pacs002_messages(count, seed=2):
+    """Return count pacs.002 messages (bytes) derived from sample_files/pacs.002_PaymentAck.xml."""
+    rng = random.Random(seed)
+    tree = etree.parse(os.path.join(SAMPLES_DIR, 'pacs.002_PaymentAck.xml'))
+    msg_id = next(tree.getroot().iter('{*}MsgId'))
+    orgnl_msg_id = next(tree.getroot().iter('{*}OrgnlMsgId'))
+    messages = []
+    for i in range(count):
+        msg_id.text = f"20250310QMGFNP{i:08d}"
+        orgnl_msg_id.text = f"20250310B1QDR{_code(rng, 9)}"
+        messages.append(etree.tostring(tree, encoding='utf-8'))
+    return messages
@@ -0,0 +1,270 @@
+# SPDX-License-Identifier: Apache-2.0
+
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the generate and parse hot paths.
+
+Each scenario runs in its own process on synthetic messages built from sample_files/,
+and reports per-stage latency percentiles, messages/sec and the peak RSS of the process.
+
+Usage:
+    python benchmarks/run.py [--messages N] [--scenario NAME ...]
+                             [--save results.json] [--baseline baseline.json] [--threshold 0.25]
+
+With --baseline, the run exits with status 1 when the p50 latency of any stage is
+more than --threshold (a fraction) slower than in the baseline.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCHMARKS_DIR, '..')))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+import payloads
+
+WARMUP = 20
+
+# Fields a routing or deduplication service reads, for the extract stage
+_ROUTING_SELECTORS = ["GrpHdr/MsgId", "Fr/FIId/FinInstnId/ClrSysMmbId/MmbId", "To/FIId/FinInstnId/ClrSysMmbId/MmbId"]
+EXTRACT_SELECTORS = {
+    payloads.PACS008: _ROUTING_SELECTORS + ["CdtTrfTxInf/PmtId/UETR", "IntrBkSttlmAmt"],
+    payloads.PACS002: _ROUTING_SELECTORS + ["OrgnlUETR", "TxSts"],
+}
+
+
+def _peak_rss_kb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def _generate_stages(message_code, document_class, payload_list):
+    """Time each generation stage for every payload; returns {stage: [seconds, ...]}."""
+    from miso20022.bah.apphdr import AppHdr
+    from miso20022.fedwire import generate_fedwire_message, generate_message_structure, parse_message_envelope
+    from miso20022.helpers import dict_to_xml, element_to_xml
+    from miso20022.instrumentation import StageHistogram, stage_hook
+
+    clock = time.perf_counter
+    histogram = StageHistogram()
+    stages = {name: [] for name in ("apphdr_build", "document_build", "serialization",
+                                    "envelope_assembly", "dict_to_xml", "total", "total_compact", "total_traced")}
+    for payload in payload_list:
+        t0 = clock()
+        app_hdr = AppHdr.from_payload(payloads.ENVIRONMENT, payloads.FED_ABA, message_code, payload)
+        t1 = clock()
+        document = document_class.from_payload(payload)
+        t2 = clock()
+        app_hdr_xml = element_to_xml(app_hdr.to_element())
+        document_xml = element_to_xml(document.to_element())
+        t3 = clock()
+        envelope = parse_message_envelope(payloads.ENVELOPE_XSD, message_code)
+        generate_message_structure(app_hdr_xml, document_xml, *envelope)
+        t4 = clock()
+        dict_to_xml(document.to_dict(), "pacs", message_code)
+        t5 = clock()
+        generate_fedwire_message(message_code, payloads.ENVIRONMENT, payloads.FED_ABA, payload, payloads.ENVELOPE_XSD)
+        t6 = clock()
+        generate_fedwire_message(message_code, payloads.ENVIRONMENT, payloads.FED_ABA, payload, payloads.ENVELOPE_XSD,
+                                 compact=True)
+        t7 = clock()
+        with stage_hook(histogram):
+            generate_fedwire_message(message_code, payloads.ENVIRONMENT, payloads.FED_ABA, payload, payloads.ENVELOPE_XSD)
+        t8 = clock()
+
+        stages["apphdr_build"].append(t1 - t0)
+        stages["document_build"].append(t2 - t1)
+        stages["serialization"].append(t3 - t2)
+        stages["envelope_assembly"].append(t4 - t3)
+        stages["dict_to_xml"].append(t5 - t4)
+        stages["total"].append(t6 - t5)
+        stages["total_compact"].append(t7 - t6)
+        stages["total_traced"].append(t8 - t7)
+    return stages
+
+
+def _parse_stages(message_code, messages):
+    """Time each parsing stage for every message; returns {stage: [seconds, ...]}."""
+    from miso20022.decoder import find_child
+    from miso20022.extract import extract
+    from miso20022.fedwire import (FEDWIRE_MESSAGE_CODES, fedwire_payload_from_dict, fedwire_payload_from_element,
+                                   generate_fedwire_payload)
+    from miso20022.helpers import load_xml_root, parse_xml_to_dict, parse_xml_to_json
+    from miso20022.json_backend import dumps_bytes
+
+    message_name = next(name for name, code in FEDWIRE_MESSAGE_CODES.items() if code == message_code)
+    clock = time.perf_counter
+    selectors = EXTRACT_SELECTORS[message_code]
+    stages = {name: [] for name in ("xml_parse", "model_mapping", "decode", "extract", "parse_xml_to_json", "total",
+                                    "json_indent", "json_compact_stdlib", "json_compact")}
+    for message in messages:
+        t0 = clock()
+        data = parse_xml_to_dict(message)
+        t1 = clock()
+        fedwire_payload_from_dict(data, message_code)
+        t2 = clock()
+        root = load_xml_root(message)
+        t3 = clock()
+        fedwire_payload_from_element(find_child(find_child(root, 'FedwireFundsOutgoingMessage'), message_name), message_code)
+        t4 = clock()
+        extract(message, selectors)
+        t5 = clock()
+        parse_xml_to_json(io.BytesIO(message))
+        t6 = clock()
+        payload = generate_fedwire_payload(message, message_code)
+        t7 = clock()
+        json.dumps(payload, indent=4)
+        t8 = clock()
+        json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        t9 = clock()
+        dumps_bytes(payload, compact=True)
+        t10 = clock()
+
+        stages["xml_parse"].append(t1 - t0)
+        stages["model_mapping"].append(t2 - t1)
+        stages["decode"].append(t4 - t3)
+        stages["extract"].append(t5 - t4)
+        stages["parse_xml_to_json"].append(t6 - t5)
+        stages["total"].append(t7 - t6)
+        stages["json_indent"].append(t8 - t7)
+        stages["json_compact_stdlib"].append(t9 - t8)
+        stages["json_compact"].append(t10 - t9)
+    return stages
+
+
+def _scenario_inputs(name, count):
+    from miso20022.pacs.pacs008 import Document as Pacs008Document
+    from miso20022.pacs.pacs028 import Document as Pacs028Document
+
+    if name == "generate.pacs.008":
+        return lambda items: _generate_stages(payloads.PACS008, Pacs008Document, items), payloads.pacs008_payloads(count)
+    if name == "generate.pacs.028":
+        return lambda items: _generate_stages(payloads.PACS028, Pacs028Document, items), payloads.pacs028_payloads(count)
+    if name == "parse.pacs.008":
+        return lambda items: _parse_stages(payloads.PACS008, items), payloads.pacs008_messages(count)
+    if name == "parse.pacs.002":
+        return lambda items: _parse_stages(payloads.PACS002, items), payloads.pacs002_messages(count)
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+SCENARIOS = ["generate.pacs.008", "generate.pacs.028", "parse.pacs.008", "parse.pacs.002"]
+
+
+def _percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(name, count):
+    """Run one scenario in the current process and return its results."""
+    measure, items = _scenario_inputs(name, count)
+
+    # The library reports progress with print(); keep it out of the results
+    with contextlib.redirect_stdout(io.StringIO()):
+        measure(items[:WARMUP])
+        stages = measure(items)
+
+    results = {}
+    for stage, timings in stages.items():
+        ordered = sorted(timings)
+        results[stage] = {
+            "mean_us": sum(ordered) / len(ordered) * 1e6,
+            "p50_us": _percentile(ordered, 0.50) * 1e6,
+            "p90_us": _percentile(ordered, 0.90) * 1e6,
+            "p99_us": _percentile(ordered, 0.99) * 1e6,
+        }
+    return {
+        "messages": len(items),
+        "messages_per_sec": len(items) / sum(stages["total"]),
+        "peak_rss_kb": _peak_rss_kb(),
+        "stages": results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regressions of the p50 stage latency beyond threshold."""
+    regressions = []
+    for scenario, data in results["scenarios"].items():
+        base_scenario = baseline.get("scenarios", {}).get(scenario)
+        if not base_scenario:
+            continue
+        for stage, timings in data["stages"].items():
+            base_stage = base_scenario["stages"].get(stage)
+            if not base_stage or not base_stage["p50_us"]:
+                continue
+            change = timings["p50_us"] / base_stage["p50_us"] - 1
+            if change > threshold:
+                regressions.append(f"{scenario} {stage}: p50 {base_stage['p50_us']:.1f}us -> "
+                                   f"{timings['p50_us']:.1f}us (+{change:.0%})")
+    return regressions
+
+
+def print_results(results):
+    for scenario, data in results["scenarios"].items():
+        print(f"\n{scenario}: {data['messages']} messages, {data['messages_per_sec']:.0f} msg/s, "
+              f"peak RSS {data['peak_rss_kb'] / 1024:.1f} MB")
+        print(f"  {'stage':<20} {'mean_us':>10} {'p50_us':>10} {'p90_us':>10} {'p99_us':>10}")
+        for stage, timings in data["stages"].items():
+            print(f"  {stage:<20} {timings['mean_us']:>10.1f} {timings['p50_us']:>10.1f} "
+                  f"{timings['p90_us']:>10.1f} {timings['p99_us']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the miso20022 generate and parse hot paths.')
+    parser.add_argument('--messages', type=int, default=2000, help='Messages per scenario.')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Scenario to run (repeatable; default: all).')
+    parser.add_argument('--save', help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', help='Compare against results saved with --save.')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed p50 slowdown per stage as a fraction.')
+    args = parser.parse_args()
+
+    from miso20022.json_backend import BACKEND as JSON_BACKEND
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "messages": args.messages,
+            "json_backend": JSON_BACKEND,
+        },
+        "scenarios": {},
+    }
+
+    # A fresh process per scenario keeps the peak RSS figures independent
+    context = multiprocessing.get_context('spawn')
+    for name in args.scenario or SCENARIOS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results["scenarios"][name] = executor.submit(run_scenario, name, args.messages).result()
+
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=4)
+        print(f"\nResults written to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo stage regressed beyond {args.threshold:.0%} of {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
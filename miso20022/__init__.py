@@ -2,21 +2,70 @@
 
 """
 ISO 20022 data models package.
+
+Public names are loaded on first access, so importing the package (or one of
+its model modules) does not pull in lxml, xmltodict or the Fedwire machinery.
 """
 
-from dataclasses import asdict
-from miso20022.bah.apphdr import AppHdr
-from miso20022.pacs import Document, FIToFICstmrCdtTrf
-from miso20022.helpers import dict_to_xml, parse_xml_to_json
-from miso20022.fedwire import (
-    generate_fedwire_message,
-    generate_fedwire_payload,
-    parse_message_envelope,
-    generate_message_structure,
-)
+import importlib
+
+# Public name -> module that defines it
+_LAZY_ATTRIBUTES = {
+    "AppHdr": "miso20022.bah.apphdr",
+    "Document": "miso20022.pacs",
+    "FIToFICstmrCdtTrf": "miso20022.pacs",
+    "dict_to_xml": "miso20022.helpers",
+    "element_to_xml": "miso20022.helpers",
+    "model_to_element": "miso20022.helpers",
+    "parse_xml_to_dict": "miso20022.helpers",
+    "parse_xml_to_json": "miso20022.helpers",
+    "extract": "miso20022.extract",
+    "DuplicateDetector": "miso20022.dedup",
+    "MessageStore": "miso20022.message_store",
+    "MessageArchive": "miso20022.archive",
+    "generate_fedwire_message": "miso20022.fedwire",
+    "build_fedwire_message": "miso20022.fedwire",
+    "generate_fedwire_bulk_message": "miso20022.fedwire",
+    "write_fedwire_message": "miso20022.fedwire",
+    "generate_fedwire_payload": "miso20022.fedwire",
+    "iter_fedwire_payloads": "miso20022.fedwire",
+    "detect_message_code": "miso20022.fedwire",
+    "parse_message_envelope": "miso20022.fedwire",
+    "compile_envelope_index": "miso20022.fedwire",
+    "load_envelope_index": "miso20022.fedwire",
+    "generate_message_structure": "miso20022.fedwire",
+    "StageHistogram": "miso20022.instrumentation",
+    "stage_hook": "miso20022.instrumentation",
+    "add_stage_hook": "miso20022.instrumentation",
+    "remove_stage_hook": "miso20022.instrumentation",
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name), name)
+    # Cache on the package so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
 
 def model_to_xml(model, prefix=None, namespace=None):
-    """Convert model to XML using the dictionary-based approach."""
+    """Convert model to XML, serializing directly when the model supports it."""
+    from dataclasses import asdict
+
+    from miso20022.helpers import dict_to_xml, element_to_xml
+
+    if hasattr(model, 'to_element'):
+        element = model.to_element()
+        # The direct serializer gives the same output only for the model's own prefix and namespace
+        if element.prefix == prefix and element.nsmap.get(prefix) == namespace:
+            return element_to_xml(element)
     if hasattr(model, 'to_dict'):
         xml_dict = model.to_dict()
     else:
@@ -36,10 +85,28 @@ __all__ = [
     "Document",
     "FIToFICstmrCdtTrf",
     "dict_to_xml",
+    "element_to_xml",
+    "model_to_element",
     "model_to_xml",
     "generate_fedwire_message",
+    "build_fedwire_message",
+    "generate_fedwire_bulk_message",
+    "write_fedwire_message",
     "generate_fedwire_payload",
+    "iter_fedwire_payloads",
+    "detect_message_code",
     "parse_message_envelope",
+    "compile_envelope_index",
+    "load_envelope_index",
     "generate_message_structure",
+    "parse_xml_to_dict",
     "parse_xml_to_json",
+    "extract",
+    "DuplicateDetector",
+    "MessageStore",
+    "MessageArchive",
+    "StageHistogram",
+    "stage_hook",
+    "add_stage_hook",
+    "remove_stage_hook",
 ]
@@ -0,0 +1,253 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Memory-mapped reader for archives of concatenated Fedwire documents.
+
+A replay archive is a file of back-to-back FedwireFundsOutgoing (or
+FedwireFundsIncoming) documents, often several GB in size. MessageArchive maps the
+file instead of reading it, finds the document boundaries by scanning the bytes for
+the root start tag and its close tag, and hands each document to the parser as a
+slice of the mapping, so only the pages being parsed are resident and nothing is
+copied up front.
+
+The boundaries are plain byte offsets. split() cuts the archive into ranges at
+document boundaries without scanning it, so each worker process can map the same
+file and read only its own range (see miso20022.batch.parse_archive).
+
+Root elements are found lexically: a root start tag inside a comment or CDATA
+section would be taken for a document. A single root holding many messages is one
+document; its messages are still streamed one at a time.
+"""
+
+import mmap
+import os
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from miso20022.fedwire import iter_fedwire_payloads
+
+# Root elements of the documents in an archive
+ROOT_ELEMENTS = ('FedwireFundsOutgoing', 'FedwireFundsIncoming')
+
+# Bytes per range handed to a worker by split()
+DEFAULT_RANGE_SIZE = 8 * 1024 * 1024
+
+# '<' + optional namespace prefix + root name, followed by whitespace, '/' or '>'
+_ROOT_START = re.compile(
+    rb'<((?:[A-Za-z_][\w.-]*:)?(?:' + b'|'.join(name.encode('ascii') for name in ROOT_ELEMENTS) + rb'))(?=[\s/>])'
+)
+_TAG_END = re.compile(rb'\s*>')
+# XML declaration, followed only by whitespace up to the end of the searched bytes
+_DECLARATION = re.compile(rb'<\?xml\s[^>]*\?>\s*$')
+# Bytes before a root start tag searched for its document's XML declaration
+_DECLARATION_LOOKBEHIND = 256
+
+
+class _ViewReader:
+    """Binary file-like object over a memoryview; only the pieces the parser asks for are copied."""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = len(self._view) - self._position
+        chunk = self._view[self._position:self._position + size]
+        self._position += len(chunk)
+        return chunk.tobytes()
+
+
+class MessageArchive:
+    """
+    Read-only memory mapping of an archive file, with its document boundaries.
+
+    Example:
+        with MessageArchive('2025-01.xml') as archive:
+            for start, end in archive.iter_boundaries():
+                print(start, end)
+            for fedwire_json in archive.iter_payloads():
+                ...
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path to the archive file.
+
+        Raises:
+            ValueError: If the file cannot be opened or mapped.
+        """
+        self.path = path
+        try:
+            self._file = open(path, 'rb')
+        except OSError as e:
+            raise ValueError(f"Could not open archive {path}: {e}")
+        try:
+            self.size = os.fstat(self._file.fileno()).st_size
+            # An empty file cannot be mapped; it simply has no documents
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        except (OSError, ValueError) as e:
+            self._file.close()
+            raise ValueError(f"Could not map archive {path}: {e}")
+        if self.size and hasattr(self._map, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):  # Python 3.8+, POSIX
+            self._map.madvise(mmap.MADV_SEQUENTIAL)
+        self._view = memoryview(self._map)
+
+    def __enter__(self) -> "MessageArchive":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Unmap and close the file. Slices returned by document() must be released first."""
+        if self._view is None:
+            return
+        self._view.release()
+        self._view = None
+        if self.size:
+            self._map.close()
+        self._file.close()
+
+    def iter_boundaries(self, start: int = 0, end: Optional[int] = None) -> Iterator[Tuple[int, int]]:
+        """
+        Find the documents whose root start tag begins in a byte range.
+
+        Args:
+            start: Offset to start scanning from. It may fall inside a document, which is
+                then left to the range before it.
+            end: Offset at which to stop looking for further documents. A document that
+                starts before end is returned whole, even if it ends after it.
+
+        Yields:
+            (start, end) byte offsets of each document, from its root start tag up to and
+            including its close tag.
+
+        Raises:
+            ValueError: If a root element is not closed.
+        """
+        end = self.size if end is None else min(end, self.size)
+        data = self._map
+        position = start
+        while position < end:
+            match = _ROOT_START.search(data, position)
+            if match is None or match.start() >= end:
+                return
+            name = match.group(1)
+            tag_close = data.find(b'>', match.end())
+            if tag_close == -1:
+                raise ValueError(f"Unterminated {name.decode('ascii')} start tag at byte {match.start()} of {self.path}")
+            if data[tag_close - 1:tag_close] == b'/':
+                document_end = tag_close + 1
+            else:
+                close_tag = b'</' + name
+                search_from = tag_close + 1
+                while True:
+                    close_start = data.find(close_tag, search_from)
+                    if close_start == -1:
+                        raise ValueError(f"Unterminated {name.decode('ascii')} element at byte {match.start()} of {self.path}")
+                    # Rule out longer names sharing the prefix, e.g. a FedwireFundsOutgoingMessage close tag
+                    tag_end = _TAG_END.match(data, close_start + len(close_tag))
+                    if tag_end is not None:
+                        document_end = tag_end.end()
+                        break
+                    search_from = close_start + len(close_tag)
+            yield match.start(), document_end
+            position = document_end
+
+    def boundaries(self, start: int = 0, end: Optional[int] = None) -> List[Tuple[int, int]]:
+        """Return the (start, end) offsets of the documents in a byte range; see iter_boundaries."""
+        return list(self.iter_boundaries(start, end))
+
+    def document(self, start: int, end: int) -> memoryview:
+        """Return a document as a zero-copy slice of the mapping."""
+        return self._view[start:end]
+
+    def _declaration_start(self, start: int) -> int:
+        """Return the offset of the XML declaration just before a root start tag, or start without one."""
+        window_start = max(0, start - _DECLARATION_LOOKBEHIND)
+        window = self._map[window_start:start]
+        declaration = window.rfind(b'<?xml')
+        if declaration == -1 or not _DECLARATION.match(window, declaration):
+            return start
+        return window_start + declaration
+
+    def split(self, range_size: int = DEFAULT_RANGE_SIZE) -> List[Tuple[int, int]]:
+        """
+        Cut the archive into byte ranges of about range_size that start at a document.
+
+        Only the bytes around each cut are read: every nominal cut point is moved
+        forward to the next root start tag. Passing a range to iter_boundaries or
+        iter_payloads yields exactly the documents starting in it, so the ranges can be
+        processed independently, e.g. by separate worker processes.
+
+        Args:
+            range_size: Target size of each range in bytes.
+
+        Returns:
+            Contiguous (start, end) ranges covering the archive, in file order; none for
+            an empty file.
+        """
+        if range_size <= 0:
+            raise ValueError("range_size must be positive")
+        if not self.size:
+            return []
+        cuts = [0]
+        nominal = range_size
+        while nominal < self.size:
+            match = _ROOT_START.search(self._map, max(nominal, cuts[-1] + 1))
+            if match is None:
+                break
+            cuts.append(match.start())
+            nominal = match.start() + range_size
+        cuts.append(self.size)
+        return [(cut, cuts[index + 1]) for index, cut in enumerate(cuts[:-1])]
+
+    def iter_document_payloads(self, start: int, end: int, message_code: Optional[str] = None,
+                               dedup=None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the Fedwire JSON payloads of one document.
+
+        Args:
+            start: Start offset of the document, from iter_boundaries.
+            end: End offset of the document, from iter_boundaries.
+            message_code: Optional message code; when given, other message types are skipped.
+            dedup: Optional miso20022.dedup.DuplicateDetector, see iter_fedwire_payloads.
+
+        Yields:
+            One Fedwire JSON payload dictionary per message, in document order; see
+            iter_fedwire_payloads for messages with several transactions.
+
+        Raises:
+            ValueError: If the document cannot be parsed.
+        """
+        # The slice includes the document's own declaration, so its encoding is honoured
+        document = self.document(self._declaration_start(start), end)
+        try:
+            yield from iter_fedwire_payloads(_ViewReader(document), message_code, dedup)
+        except ValueError as e:
+            raise ValueError(f"Document at bytes {start}-{end} of {self.path}: {e}")
+        finally:
+            document.release()
+
+    def iter_payloads(self, message_code: Optional[str] = None, dedup=None,
+                      start: int = 0, end: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the Fedwire JSON payloads of the documents in a byte range.
+
+        Args:
+            message_code: Optional message code; when given, other message types are skipped.
+            dedup: Optional miso20022.dedup.DuplicateDetector, see iter_fedwire_payloads.
+            start: Offset to start from, see iter_boundaries.
+            end: Offset at which to stop, see iter_boundaries.
+
+        Yields:
+            One Fedwire JSON payload dictionary per message, in file order; see
+            iter_fedwire_payloads for messages with several transactions.
+
+        Raises:
+            ValueError: If a document cannot be parsed.
+        """
+        for document_start, document_end in self.iter_boundaries(start, end):
+            yield from self.iter_document_payloads(document_start, document_end, message_code, dedup)
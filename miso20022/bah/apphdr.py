@@ -1,42 +1,47 @@
 # SPDX-License-Identifier: Apache-2.0
 
-from dataclasses import dataclass, asdict
+from dataclasses import asdict
 from datetime import datetime, timezone
-from typing import Dict, Any, Tuple
+from typing import TYPE_CHECKING, Dict, Any, Tuple
 
+from miso20022.common.base import model
 
-@dataclass
+if TYPE_CHECKING:
+    from lxml import etree
+
+
+@model(frozen=True)
 class ClrSysMmbId:
     MmbId: str
 
 
-@dataclass
+@model(frozen=True)
 class FinInstnId:
     ClrSysMmbId: ClrSysMmbId
 
 
-@dataclass
+@model(frozen=True)
 class FIId:
     FinInstnId: FinInstnId
 
 
-@dataclass
+@model(frozen=True)
 class Fr:
     FIId: FIId
 
 
-@dataclass
+@model(frozen=True)
 class To:
     FIId: FIId
 
 
-@dataclass
+@model(frozen=True)
 class MktPrctc:
     Regy: str
     Id: str
 
 
-@dataclass
+@model
 class AppHdr:
     Fr: Fr
     To: To
@@ -55,6 +60,12 @@ class AppHdr:
             }
         }
 
+    def to_element(self) -> "etree._Element":
+        """Convert this model directly to an lxml element for XML generation."""
+        from miso20022.helpers import model_to_element
+
+        return model_to_element(self, "AppHdr", "head", "urn:iso:std:iso:20022:tech:xsd:head.001.001.03")
+
     @classmethod
     def from_payload(
             cls,
@@ -114,13 +125,23 @@ class AppHdr:
         )
 
     @classmethod
-    def from_iso20022(cls, data: Dict[str, Any],message_code)-> "AppHdr":
+    def from_iso20022(cls, data: Dict[str, Any], message_code=None) -> "AppHdr":
+        """Create an AppHdr instance from a parsed Fedwire message dictionary.
 
-        # 1. Extract AppHdr data
-        if message_code == "urn:iso:std:iso:20022:tech:xsd:pacs.008.001.08":
-            app_hdr_data = data['FedwireFundsOutgoing']['FedwireFundsOutgoingMessage']['FedwireFundsCustomerCreditTransfer']['AppHdr']
-        elif message_code == "urn:iso:std:iso:20022:tech:xsd:pacs.002.001.10":
-            app_hdr_data = data['FedwireFundsOutgoing']['FedwireFundsOutgoingMessage']['FedwireFundsPaymentStatus']['AppHdr']
+        Args:
+            data: The parsed message, rooted at FedwireFundsOutgoing.
+            message_code: Not needed; the AppHdr is found under whichever message element
+                the dictionary holds. Kept for existing callers.
+
+        Returns:
+            An AppHdr instance.
+        """
+        # 1. Extract AppHdr data from the message element, whatever its type
+        messages = data['FedwireFundsOutgoing']['FedwireFundsOutgoingMessage']
+        app_hdr_data = next((message['AppHdr'] for message in messages.values()
+                             if isinstance(message, dict) and 'AppHdr' in message), None)
+        if app_hdr_data is None:
+            raise ValueError("No AppHdr found in the Fedwire message")
 
         # 2. Instantiate the AppHdr data class
         app_hdr = AppHdr(
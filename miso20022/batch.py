@@ -0,0 +1,394 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Batch generation and parsing of ISO 20022 messages over a pool of worker processes.
+"""
+
+import glob
+import io
+import json
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from lxml import etree
+
+from miso20022.fedwire import FEDWIRE_MESSAGE_CODES, build_fedwire_message, generate_fedwire_payload, iter_fedwire_payloads
+from miso20022.helpers import XMLDocumentStream
+
+# Records handed to a worker process per task
+DEFAULT_CHUNK_SIZE = 64
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one batch record."""
+    name: str
+    output: Optional[Any] = None
+    error: Optional[str] = None
+    size: int = 0
+
+
+def read_payload_records(source: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (name, JSON text) records from a JSONL file or a directory of JSON files.
+
+    Args:
+        source: Path to a JSONL file (one payload per line) or a directory of *.json files.
+
+    Yields:
+        The record name (line number or file name without extension) and its JSON text.
+    """
+    if os.path.isdir(source):
+        for filename in sorted(os.listdir(source)):
+            if filename.endswith('.json'):
+                with open(os.path.join(source, filename), 'r') as f:
+                    yield os.path.splitext(filename)[0], f.read()
+        return
+
+    with open(source, 'r') as f:
+        for line_number, line in enumerate(f, start=1):
+            if line.strip():
+                yield str(line_number), line
+
+
+class PayloadRecords:
+    """Re-iterable view of the payloads in a JSONL file or directory; each pass re-reads the source."""
+
+    def __init__(self, source: str):
+        self.source = source
+
+    def __iter__(self) -> Iterator[Any]:
+        for name, text in read_payload_records(self.source):
+            try:
+                yield json.loads(text)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON payload in record {name}: {e}")
+
+
+def find_input_files(source: str) -> List[str]:
+    """
+    Return the files to process for a directory, a glob pattern, or a single file.
+
+    Args:
+        source: Directory (every file in it), glob pattern (e.g. 'inbound/*.xml') or file path.
+
+    Returns:
+        The matching file paths, sorted.
+    """
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)]
+    else:
+        paths = glob.glob(source)
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+def _chunks(records: Iterable[Any], chunk_size: int) -> Iterator[List[Any]]:
+    """Split records into lists of at most chunk_size items."""
+    iterator = iter(records)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(worker: Callable[[List[Any]], List[BatchResult]], records: Iterable[Any],
+              workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+              ordered: bool = True, executor: Optional[Executor] = None) -> Iterator[BatchResult]:
+    """
+    Run a chunk worker over records in a process pool and yield its results.
+
+    Only a bounded number of chunks is in flight at a time, so the records are read
+    lazily and memory use does not grow with the size of the batch.
+
+    Args:
+        worker: Picklable function mapping a list of records to a list of BatchResult.
+        records: The records to process.
+        workers: Number of worker processes. Defaults to the CPU count; 1 runs in-process.
+            With executor, the number of workers it runs (bounds the chunks in flight).
+        chunk_size: Number of records sent to a worker per task.
+        ordered: If True, yield results in input order; otherwise as each chunk completes.
+        executor: Long-lived pool to submit to (e.g. shared by a server) instead of
+            starting one for this batch; it is not shut down afterwards.
+
+    Yields:
+        One BatchResult per record.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(records, chunk_size)
+
+    if executor is not None:
+        yield from _run_chunks(executor, worker, chunks, workers * 2, ordered)
+        return
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from worker(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from _run_chunks(executor, worker, chunks, workers * 2, ordered)
+
+
+def _run_chunks(executor: Executor, worker: Callable[[List[Any]], List[BatchResult]], chunks: Iterator[List[Any]],
+                max_pending: int, ordered: bool) -> Iterator[BatchResult]:
+    """Submit chunks to the executor, keeping at most max_pending in flight, and yield their results."""
+    if ordered:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(worker, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+        return
+
+    pending = set()
+    for chunk in chunks:
+        pending.add(executor.submit(worker, chunk))
+        if len(pending) >= max_pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+    for future in wait(pending).done:
+        yield from future.result()
+
+
+class GenerateWorker:
+    """Chunk worker that turns (name, JSON text) records into complete Fedwire messages."""
+
+    def __init__(self, message_code: str, environment: str, fed_aba: str, xsd_path: str,
+                 validate: bool = False, schema_dir: Optional[str] = None, compact: bool = False):
+        self.message_code = message_code
+        self.environment = environment
+        self.fed_aba = fed_aba
+        self.xsd_path = xsd_path
+        self.validate = validate
+        self.schema_dir = schema_dir
+        self.compact = compact
+
+    def __call__(self, records: List[Tuple[str, str]]) -> List[BatchResult]:
+        return [self.generate(name, text) for name, text in records]
+
+    def generate(self, name: str, text: str) -> BatchResult:
+        """Generate the message for one record, capturing the reason it failed if it did."""
+        try:
+            payload = json.loads(text)
+        except json.JSONDecodeError as e:
+            return BatchResult(name, error=f"Invalid JSON payload: {e}")
+
+        try:
+            _, _, complete_message = build_fedwire_message(
+                self.message_code, self.environment, self.fed_aba, payload, self.xsd_path,
+                validate=self.validate, schema_dir=self.schema_dir, compact=self.compact
+            )
+        except ValueError as e:
+            return BatchResult(name, error=str(e) or "Failed to generate complete message")
+        return BatchResult(name, output=complete_message)
+
+
+def generate_batch(records: Iterable[Tuple[str, str]], message_code: str, environment: str, fed_aba: str,
+                   xsd_path: str, workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   validate: bool = False, schema_dir: Optional[str] = None,
+                   compact: bool = False) -> Iterator[BatchResult]:
+    """
+    Generate complete Fedwire messages for many payloads in parallel.
+
+    Args:
+        records: (name, JSON text) records, e.g. from read_payload_records.
+        message_code: The ISO20022 message code (e.g., urn:iso:std:iso:20022:tech:xsd:pacs.008.001.08).
+        environment: The environment for the messages, either "TEST" or "PROD".
+        fed_aba: The Fed ABA number for message generation.
+        xsd_path: Path to the XSD file for structure identification.
+        workers: Number of worker processes. Defaults to the CPU count.
+        chunk_size: Number of records sent to a worker per task.
+        validate: If True, validate each message against its ISO20022 schemas.
+        schema_dir: Directory holding the ISO20022 XSD files used with validate.
+        compact: If True, each message is compact UTF-8 encoded bytes instead of indented str.
+
+    Yields:
+        One BatchResult per record in input order, holding the XML or the failure reason.
+    """
+    worker = GenerateWorker(message_code, environment, fed_aba, xsd_path, validate, schema_dir, compact)
+    return run_batch(worker, records, workers, chunk_size)
+
+
+class ParseWorker:
+    """Chunk worker that turns XML file paths into Fedwire JSON payloads."""
+
+    def __init__(self, message_code: Optional[str] = None):
+        self.message_code = message_code
+
+    def __call__(self, paths: List[str]) -> List[BatchResult]:
+        return [self.parse(path) for path in paths]
+
+    def parse(self, path: str) -> BatchResult:
+        """Parse one file; the output is the list of payloads it holds."""
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError as e:
+            return BatchResult(path, error=str(e))
+        return self.parse_content(path, content)
+
+    def parse_content(self, name: str, content: bytes) -> BatchResult:
+        """Parse one XML document or Fedwire message element held in memory."""
+        try:
+            if self.message_code:
+                payload = generate_fedwire_payload(content, self.message_code)
+                # A message with several transactions gives one payload per transaction
+                payloads = payload if isinstance(payload, list) else [payload]
+            else:
+                # Without a message code each message is mapped according to its element name
+                payloads = list(iter_fedwire_payloads(io.BytesIO(content)))
+                if not payloads:
+                    raise ValueError("No supported Fedwire message found")
+        except Exception as e:
+            return BatchResult(name, error=str(e) or type(e).__name__, size=len(content))
+        return BatchResult(name, output=payloads, size=len(content))
+
+
+class ParseContentWorker(ParseWorker):
+    """Chunk worker that turns (name, XML content) records into Fedwire JSON payloads."""
+
+    def __call__(self, records: List[Tuple[str, bytes]]) -> List[BatchResult]:
+        return [self.parse_content(name, content) for name, content in records]
+
+
+def split_fedwire_messages(source, message_code: Optional[str] = None) -> Iterator[Tuple[str, bytes]]:
+    """
+    Split a multi-message XML stream into one serialized record per Fedwire message.
+
+    Like iter_fedwire_payloads, this accepts one FedwireFundsOutgoing document or many
+    concatenated documents, and releases each message once it has been serialized, so
+    the records can be handed to ParseContentWorker without holding the whole stream.
+
+    Args:
+        source: A binary file-like object.
+        message_code: Optional message code; when given, other message types are skipped.
+
+    Yields:
+        (message number, XML of the message element) records, numbered from 1.
+
+    Raises:
+        ValueError: If the XML cannot be parsed.
+    """
+    tags = [f"{{*}}{name}" for name in FEDWIRE_MESSAGE_CODES]
+    number = 0
+    try:
+        for _, element in etree.iterparse(XMLDocumentStream(source), events=('end',), tag=tags):
+            number += 1
+            if message_code is None or FEDWIRE_MESSAGE_CODES[etree.QName(element).localname] == message_code:
+                yield str(number), etree.tostring(element, with_tail=False)
+
+            # Release the message and everything read before it
+            element.clear()
+            for ancestor in element.iterancestors():
+                while ancestor.getprevious() is not None:
+                    del ancestor.getparent()[0]
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    except etree.XMLSyntaxError as e:
+        raise ValueError(f"Error parsing XML file: {e}")
+
+
+class ArchiveWorker:
+    """Chunk worker that turns (start, end) byte ranges of an archive into Fedwire JSON payloads."""
+
+    def __init__(self, path: str, message_code: Optional[str] = None):
+        self.path = path
+        self.message_code = message_code
+
+    def __call__(self, ranges: List[Tuple[int, int]]) -> List[BatchResult]:
+        from miso20022.archive import MessageArchive
+
+        results = []
+        try:
+            archive = MessageArchive(self.path)
+        except ValueError as e:
+            return [BatchResult(f"{self.path}:{start}-{end}", error=str(e)) for start, end in ranges]
+        with archive:
+            for range_start, range_end in ranges:
+                results.extend(self.parse_range(archive, range_start, range_end))
+        return results
+
+    def parse_range(self, archive, range_start: int, range_end: int) -> List[BatchResult]:
+        """Parse the documents starting in a byte range; the output of each is the list of payloads it holds."""
+        results = []
+        boundaries = archive.iter_boundaries(range_start, range_end)
+        position = range_start
+        while True:
+            try:
+                boundary = next(boundaries, None)
+            except ValueError as e:
+                # The rest of the range cannot be split into documents
+                results.append(BatchResult(f"{self.path}:{position}-{range_end}", error=str(e), size=range_end - position))
+                break
+            if boundary is None:
+                break
+            start, end = boundary
+            position = end
+            name = f"{self.path}:{start}-{end}"
+            try:
+                payloads = list(archive.iter_document_payloads(start, end, self.message_code))
+                if not payloads and self.message_code is None:
+                    raise ValueError("No supported Fedwire message found")
+            except Exception as e:
+                results.append(BatchResult(name, error=str(e) or type(e).__name__, size=end - start))
+                continue
+            results.append(BatchResult(name, output=payloads, size=end - start))
+        return results
+
+
+def parse_archive(path: str, message_code: Optional[str] = None, workers: Optional[int] = None,
+                  range_size: Optional[int] = None, ordered: bool = True) -> Iterator[BatchResult]:
+    """
+    Parse an archive of concatenated Fedwire documents in parallel.
+
+    The archive is memory-mapped and cut into ranges at document boundaries (see
+    miso20022.archive.MessageArchive.split); each worker maps the file itself and
+    parses only its ranges, so the file is never read whole or sent between processes.
+
+    Args:
+        path: Path to the archive file.
+        message_code: Optional message code; when given, other message types are skipped.
+        workers: Number of worker processes. Defaults to the CPU count.
+        range_size: Bytes of the archive per worker task. Defaults to
+            miso20022.archive.DEFAULT_RANGE_SIZE.
+        ordered: If True, yield results in file order; otherwise as they complete.
+
+    Yields:
+        One BatchResult per document, named "<path>:<start>-<end>" after its byte offsets,
+        holding its payloads or the failure reason, and its size in bytes.
+
+    Raises:
+        ValueError: If the archive cannot be opened.
+    """
+    from miso20022.archive import DEFAULT_RANGE_SIZE, MessageArchive
+
+    with MessageArchive(path) as archive:
+        ranges = archive.split(range_size or DEFAULT_RANGE_SIZE)
+    return run_batch(ArchiveWorker(path, message_code), ranges, workers, 1, ordered)
+
+
+def parse_batch(paths: Iterable[str], message_code: Optional[str] = None, workers: Optional[int] = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE, ordered: bool = True) -> Iterator[BatchResult]:
+    """
+    Parse many ISO20022 XML files into Fedwire JSON payloads in parallel.
+
+    Args:
+        paths: The XML files to parse, e.g. from find_input_files.
+        message_code: The message code of every file. If omitted, the message type is taken
+            from each message element (FedwireFundsCustomerCreditTransfer, FedwireFundsPaymentStatus).
+        workers: Number of worker processes. Defaults to the CPU count.
+        chunk_size: Number of files sent to a worker per task.
+        ordered: If True, yield results in input order; otherwise as they complete.
+
+    Yields:
+        One BatchResult per file, holding its payloads or the failure reason, and its size in bytes.
+    """
+    return run_batch(ParseWorker(message_code), paths, workers, chunk_size, ordered)
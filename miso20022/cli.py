@@ -1,13 +1,16 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import argparse
+import contextlib
 import json
 import os
 import sys
+import time
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Union
 
-from miso20022.fedwire import generate_fedwire_message, generate_fedwire_payload
+# The library modules (and lxml) are imported inside the handlers, so that argument
+# errors and --help do not pay for them
 
 def load_input_payload(input_file_path: str) -> Dict[str, Any]:
     """Load a input payload from a JSON file."""
@@ -18,10 +21,10 @@ def load_input_payload(input_file_path: str) -> Dict[str, Any]:
         print(f"Error loading input file: {e}", file=sys.stderr)
         sys.exit(1)
 
-def write_message_to_file(message: str, output_file: str) -> bool:
+def write_message_to_file(message: Union[str, bytes], output_file: str) -> bool:
     """Write the generated message to a file."""
     try:
-        with open(output_file, 'w') as file:
+        with open(output_file, 'wb' if isinstance(message, bytes) else 'w') as file:
             file.write(message)
         print(f"Message successfully written to {output_file}")
         return True
@@ -29,6 +32,20 @@ def write_message_to_file(message: str, output_file: str) -> bool:
         print(f"Error writing message to file: {e}", file=sys.stderr)
         return False
 
+def record_in_store(store_path: str, message_file: str):
+    """Record the messages of a file in the --store message index, if one is given."""
+    if not store_path:
+        return
+    from miso20022.message_store import MessageStore
+
+    try:
+        with MessageStore(store_path) as store:
+            store.record_message(message_file)
+    except Exception as e:
+        print(f"Error recording messages in {store_path}: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{store.recorded} transactions recorded in {store_path}")
+
 def generate_output_filename(message_code: str, extension: str) -> str:
     """Generate a default output filename."""
     message_type = message_code.split(':')[-1]
@@ -47,40 +64,312 @@ def handle_generate(args):
         print(f"Error: Input file not found at {input_path}", file=sys.stderr)
         sys.exit(1)
 
+    if args.stream:
+        handle_generate_stream(args, input_path, xsd_path)
+        return
+
+    from miso20022.fedwire import generate_fedwire_bulk_message, generate_fedwire_message
+
     payload = load_input_payload(input_path)
-    _, _, complete_message = generate_fedwire_message(args.message_code, args.environment, args.fed_aba, payload, xsd_path)
+    # A JSON array of payloads becomes one message with a transaction per payload
+    generate = generate_fedwire_bulk_message if isinstance(payload, list) else generate_fedwire_message
+    _, _, complete_message = generate(args.message_code, args.environment, args.fed_aba, payload, xsd_path,
+                                      validate=args.validate, schema_dir=args.schema_dir, compact=args.compact)
 
     if complete_message:
         output_file = args.output_file or generate_output_filename(args.message_code, 'xml')
-        write_message_to_file(complete_message, output_file)
+        if write_message_to_file(complete_message, output_file):
+            record_in_store(args.store, output_file)
     else:
         print("Failed to generate complete message", file=sys.stderr)
         sys.exit(1)
 
+def handle_generate_stream(args, input_path, xsd_path):
+    """Handler for the 'generate --stream' mode, writing the message incrementally."""
+    from miso20022.batch import PayloadRecords
+    from miso20022.fedwire import write_fedwire_message
+
+    if args.validate:
+        print("Error: --validate is not supported with --stream", file=sys.stderr)
+        sys.exit(1)
+
+    # JSONL files and directories are read record by record on each pass
+    if os.path.isdir(input_path) or input_path.endswith('.jsonl'):
+        payloads = PayloadRecords(input_path)
+    else:
+        payloads = load_input_payload(input_path)
+
+    output_file = args.output_file or generate_output_filename(args.message_code, 'xml')
+    try:
+        count = write_fedwire_message(output_file, args.message_code, args.environment, args.fed_aba, payloads, xsd_path,
+                                      compact=args.compact)
+    except Exception as e:
+        print(f"Error generating message: {e}", file=sys.stderr)
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        sys.exit(1)
+    print(f"Message with {count} transactions successfully written to {output_file}")
+    record_in_store(args.store, output_file)
+
+def handle_generate_batch(args):
+    """Handler for the 'generate-batch' command."""
+    xsd_path = os.path.abspath(args.xsd_file)
+    if not os.path.exists(xsd_path):
+        print(f"Error: XSD file not found at {xsd_path}", file=sys.stderr)
+        sys.exit(1)
+
+    if not os.path.exists(args.input):
+        print(f"Error: Input not found at {args.input}", file=sys.stderr)
+        sys.exit(1)
+
+    from miso20022.batch import DEFAULT_CHUNK_SIZE, generate_batch, read_payload_records
+
+    message_type = args.message_code.split(':')[-1]
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        combined = None
+    else:
+        combined = open(args.output_file or generate_output_filename(args.message_code, 'xml'), 'wb' if args.compact else 'w')
+
+    records = read_payload_records(args.input)
+    generated = failed = 0
+    start = time.perf_counter()
+    try:
+        for result in generate_batch(records, args.message_code, args.environment, args.fed_aba, xsd_path,
+                                     workers=args.workers, chunk_size=args.chunk_size or DEFAULT_CHUNK_SIZE,
+                                     validate=args.validate, schema_dir=args.schema_dir, compact=args.compact):
+            if result.error:
+                failed += 1
+                print(f"Record {result.name} failed: {result.error}", file=sys.stderr)
+                continue
+            generated += 1
+            if combined:
+                combined.write(result.output)
+                combined.write(b'\n' if args.compact else '\n')
+            else:
+                with open(os.path.join(args.output_dir, f"{message_type}_{result.name}.xml"), 'wb' if args.compact else 'w') as f:
+                    f.write(result.output)
+    finally:
+        if combined:
+            combined.close()
+
+    elapsed = time.perf_counter() - start
+    destination = args.output_dir or combined.name
+    print(f"Generated {generated} messages ({failed} failed) in {elapsed:.2f}s into {destination}")
+    if failed:
+        sys.exit(1)
+
+def handle_parse_batch(args):
+    """Handler for the 'parse-batch' command."""
+    from miso20022.batch import DEFAULT_CHUNK_SIZE, find_input_files, parse_archive, parse_batch
+
+    if args.archive:
+        try:
+            results = parse_archive(args.input, args.message_code, workers=args.workers, ordered=not args.completion_order)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        unit = 'documents'
+    else:
+        paths = find_input_files(args.input)
+        if not paths:
+            print(f"Error: No input files found for {args.input}", file=sys.stderr)
+            sys.exit(1)
+        results = parse_batch(paths, args.message_code, workers=args.workers, chunk_size=args.chunk_size or DEFAULT_CHUNK_SIZE,
+                              ordered=not args.completion_order)
+        unit = 'files'
+
+    output_file = args.output_file or generate_output_filename(args.message_code or 'fedwire', 'jsonl')
+    reject_file = args.reject_file or f"{os.path.splitext(output_file)[0]}.rejects.jsonl"
+
+    parsed = rejected = payloads = total_bytes = 0
+    start = time.perf_counter()
+    from miso20022.json_backend import dumps_bytes
+
+    with open(output_file, 'wb') as out, open(reject_file, 'wb') as rejects:
+        for result in results:
+            total_bytes += result.size
+            if result.error:
+                rejected += 1
+                rejects.write(dumps_bytes({"file": result.name, "error": result.error}, compact=True))
+                rejects.write(b'\n')
+                continue
+            parsed += 1
+            for payload in result.output:
+                out.write(dumps_bytes(payload, compact=True))
+                out.write(b'\n')
+                payloads += 1
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"Parsed {parsed} {unit} ({rejected} rejected) into {payloads} payloads in {output_file}")
+    if rejected:
+        print(f"Rejected {unit} written to {reject_file}")
+    print(f"{(parsed + rejected) / elapsed:.1f} {unit}/sec, {total_bytes / elapsed / (1024 * 1024):.2f} MB/sec ({elapsed:.2f}s)")
+
+def load_duplicate_detector(args):
+    """Return the DuplicateDetector configured by the --dedup-* options, or None without --dedup-snapshot."""
+    if not args.dedup_snapshot:
+        return None
+    from miso20022.dedup import DuplicateDetector
+
+    try:
+        return DuplicateDetector(capacity=args.dedup_capacity, error_rate=args.dedup_error_rate,
+                                 snapshot_path=args.dedup_snapshot)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+def handle_parse_stream(args, detector=None):
+    """Handler for the 'parse --stream' mode, writing one JSON payload per line."""
+    from miso20022.fedwire import iter_fedwire_payloads
+    from miso20022.json_backend import dumps_bytes
+
+    output_file = args.output_file or generate_output_filename(args.message_code or 'fedwire', 'jsonl')
+    count = 0
+    store = None
+    try:
+        if args.store:
+            from miso20022.message_store import MessageStore
+
+            # Each message is recorded as it is streamed, so the file is not parsed twice.
+            # Closing the store writes the buffered rows, also when a later message fails.
+            store = MessageStore(args.store)
+        with store or contextlib.nullcontext(), open(output_file, 'wb') as f:
+            for payload in iter_fedwire_payloads(args.input_file, args.message_code, detector, store):
+                f.write(dumps_bytes(payload, compact=True))
+                f.write(b'\n')
+                count += 1
+    except Exception as e:
+        print(f"Error streaming payloads: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"{count} payloads successfully written to {output_file}")
+    if store:
+        print(f"{store.recorded} transactions recorded in {args.store}")
+    if detector:
+        print(f"{detector.stats['duplicates']} duplicate messages skipped")
+
 def handle_parse(args):
     """Handler for the 'parse' command."""
     if not os.path.exists(args.input_file):
         print(f"Error: Input file not found at {args.input_file}", file=sys.stderr)
         sys.exit(1)
 
-    payload = generate_fedwire_payload(args.input_file, args.message_code)
+    detector = load_duplicate_detector(args)
+    if detector:
+        # The snapshot is saved only when the command succeeds
+        with detector:
+            handle_parse_checked(args, detector)
+    else:
+        handle_parse_checked(args)
+
+def handle_parse_checked(args, detector=None):
+    """Parse the input file, skipping messages the duplicate detector has seen before."""
+    if args.stream:
+        handle_parse_stream(args, detector)
+        return
+
+    from miso20022.fedwire import detect_message_code, generate_fedwire_payload
+
+    if detector:
+        try:
+            check = detector.check(args.input_file)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        if check.is_duplicate:
+            print(f"Error: duplicate message ({check.describe()}); not parsed", file=sys.stderr)
+            sys.exit(1)
+        if check.probable:
+            print(f"Warning: possible duplicate message ({check.describe()})", file=sys.stderr)
+
+    if not args.message_code:
+        # Only the start of the file is read to find the message type
+        try:
+            args.message_code = detect_message_code(args.input_file)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        if not args.message_code:
+            print("Error: could not detect the message type; pass --message-code", file=sys.stderr)
+            sys.exit(1)
+
+    try:
+        payload = generate_fedwire_payload(args.input_file, args.message_code)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
 
     if payload:
         output_file = args.output_file or generate_output_filename(args.message_code, 'json')
         try:
-            with open(output_file, 'w') as f:
-                json.dump(payload, f, indent=4)
+            from miso20022.json_backend import dumps_bytes
+
+            with open(output_file, 'wb') as f:
+                f.write(dumps_bytes(payload, compact=args.compact))
             print(f"Payload successfully written to {output_file}")
         except Exception as e:
             print(f"Error writing payload to file: {e}", file=sys.stderr)
             sys.exit(1)
+        record_in_store(args.store, args.input_file)
     else:
         print("Failed to parse XML file.", file=sys.stderr)
         sys.exit(1)
 
+def handle_schemas_compile(args):
+    """Handler for the 'schemas compile' command."""
+    from miso20022.schema_cache import compile_cache, default_cache_path
+
+    cache_path = args.cache_file or default_cache_path()
+    try:
+        written = compile_cache(args.xsd_file, cache_path)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for key, entry in written.items():
+        print(f"{entry['path']}: {len(entry['index'])} message codes (sha256 {key[:12]})")
+    print(f"Schema cache written to {cache_path}")
+
+def handle_store_outstanding(args):
+    """Handler for the 'store outstanding' command, writing one JSON row per wire without a status."""
+    from miso20022.json_backend import dumps_bytes
+    from miso20022.message_store import MessageStore
+
+    with MessageStore(args.store) as store:
+        rows = store.outstanding(args.older_than, args.message_type, args.limit)
+    output = open(args.output_file, 'wb') if args.output_file else sys.stdout.buffer
+    try:
+        for row in rows:
+            output.write(dumps_bytes(row, compact=True))
+            output.write(b'\n')
+    finally:
+        if args.output_file:
+            output.close()
+    print(f"{len(rows)} outstanding transactions", file=sys.stderr)
+
+def handle_store_status_requests(args):
+    """Handler for the 'store status-requests' command, writing pacs.028 payloads for outstanding wires."""
+    from miso20022.json_backend import dumps_bytes
+    from miso20022.message_store import MessageStore, status_request_payloads
+
+    if not args.first_sequence_number.isdigit():
+        print("Error: --first-sequence-number must be digits", file=sys.stderr)
+        sys.exit(1)
+    with MessageStore(args.store) as store:
+        rows = store.outstanding(args.older_than, 'pacs.008', args.limit)
+    count = 0
+    with open(args.output_file, 'wb') as f:
+        for payload in status_request_payloads(rows, args.input_cycle_date, args.input_source, args.first_sequence_number):
+            f.write(dumps_bytes(payload, compact=True))
+            f.write(b'\n')
+            count += 1
+    print(f"{count} pacs.028 payloads written to {args.output_file}")
+
 def main():
 
     parser = argparse.ArgumentParser(description='A CLI tool for generating and parsing ISO 20022 messages.')
+    parser.add_argument('--profile', choices=['cpu', 'mem'], help='Profile the command: cpu writes cProfile stats and collapsed stacks for flame graphs, mem reports the top allocation sites per stage. Worker processes of the batch commands are not profiled.')
+    parser.add_argument('--profile-output', help='Path prefix of the profile files (default: miso20022_<command>_<timestamp>).')
     subparsers = parser.add_subparsers(dest='command', required=True, help='Available commands')
 
     # Generate command
@@ -88,20 +377,94 @@ def main():
     gen_parser.add_argument('--message_code', help='ISO 20022 message code (e.g., urn:iso:std:iso:20022:tech:xsd:pacs.008.001.08)')
     gen_parser.add_argument('--environment', required=True, choices=['TEST', 'PROD'], help='The environment for the message (TEST or PROD).')
     gen_parser.add_argument('--fed-aba', required=True, help='The Fed ABA number for message generation.')
-    gen_parser.add_argument('--input-file', required=True, help='Path to input JSON payload file.')
+    gen_parser.add_argument('--input-file', required=True, help='Path to input JSON payload file (with --stream, also a JSONL file or directory of payloads).')
     gen_parser.add_argument('--output-file', help='Path to output XML file.')
     gen_parser.add_argument('--xsd-file', required=True, help='Path to the XSD file.')
+    gen_parser.add_argument('--validate', action='store_true', help='Validate the AppHdr and Document against their ISO 20022 schemas.')
+    gen_parser.add_argument('--schema-dir', help='Directory holding the ISO 20022 XSD files used by --validate.')
+    gen_parser.add_argument('--stream', action='store_true', help='Write the message incrementally, one transaction at a time.')
+    gen_parser.add_argument('--compact', action='store_true', help='Write compact UTF-8 XML without indentation.')
+    gen_parser.add_argument('--store', help='Record the generated message in this SQLite message index (see the store command).')
     gen_parser.set_defaults(func=handle_generate)
 
+    # Generate batch command
+    batch_parser = subparsers.add_parser('generate-batch', help='Generate messages for many JSON payloads in parallel.')
+    batch_parser.add_argument('--message_code', '--message-code', dest='message_code', required=True, help='ISO 20022 message code (e.g., urn:iso:std:iso:20022:tech:xsd:pacs.008.001.08)')
+    batch_parser.add_argument('--environment', required=True, choices=['TEST', 'PROD'], help='The environment for the messages (TEST or PROD).')
+    batch_parser.add_argument('--fed-aba', required=True, help='The Fed ABA number for message generation.')
+    batch_parser.add_argument('--input', required=True, help='Path to a JSONL file (one payload per line) or a directory of JSON payload files.')
+    batch_output = batch_parser.add_mutually_exclusive_group()
+    batch_output.add_argument('--output-file', help='Path to a single output file holding every message.')
+    batch_output.add_argument('--output-dir', help='Directory to write one XML file per record.')
+    batch_parser.add_argument('--xsd-file', required=True, help='Path to the XSD file.')
+    batch_parser.add_argument('--workers', type=int, help='Number of worker processes (default: CPU count).')
+    batch_parser.add_argument('--chunk-size', type=int, help='Records sent to a worker per task (default: 64).')
+    batch_parser.add_argument('--validate', action='store_true', help='Validate every message against its ISO 20022 schemas.')
+    batch_parser.add_argument('--schema-dir', help='Directory holding the ISO 20022 XSD files used by --validate.')
+    batch_parser.add_argument('--compact', action='store_true', help='Write compact UTF-8 XML without indentation.')
+    batch_parser.set_defaults(func=handle_generate_batch)
+
     # Parse command
     parse_parser = subparsers.add_parser('parse', help='Parse an ISO 20022 XML file into a JSON payload.')
     parse_parser.add_argument('--input-file', required=True, help='Path to the XML file to parse.')
-    parse_parser.add_argument('--message-code', required=True, help='The message code to determine the parsing model.')
-    parse_parser.add_argument('--output-file', help='Path to output JSON file.')
+    parse_parser.add_argument('--message-code', help='The message code to determine the parsing model. If omitted, it is detected from the message element or Document namespace. With --stream, only messages of this type are written.')
+    parse_parser.add_argument('--output-file', help='Path to output JSON file (JSON Lines with --stream).')
+    parse_parser.add_argument('--stream', action='store_true', help='Stream every message in a multi-message file to JSON Lines output.')
+    parse_parser.add_argument('--compact', action='store_true', help='Write compact JSON without indentation, using orjson when installed. JSON Lines output is always compact.')
+    parse_parser.add_argument('--dedup-snapshot', help='Skip messages whose transactions were all seen before (by UETR, or MsgId and EndToEndId together), remembering keys across runs in this snapshot file.')
+    parse_parser.add_argument('--dedup-capacity', type=int, default=1_000_000, help='Keys the duplicate detector\'s Bloom filter holds before it rotates (default: 1000000).')
+    parse_parser.add_argument('--dedup-error-rate', type=float, default=0.001, help='False-positive rate of the duplicate detector\'s Bloom filter (default: 0.001).')
+    parse_parser.add_argument('--store', help='Record the parsed messages in this SQLite message index (see the store command).')
     parse_parser.set_defaults(func=handle_parse)
 
+    # Parse batch command
+    parse_batch_parser = subparsers.add_parser('parse-batch', help='Parse many ISO 20022 XML files in parallel into JSON Lines.')
+    parse_batch_parser.add_argument('--input', required=True, help='Directory or glob pattern (quoted, e.g. "inbound/*.xml") of XML files to parse, or the archive file with --archive.')
+    parse_batch_parser.add_argument('--archive', action='store_true', help='Treat --input as one archive of concatenated Fedwire documents, memory-mapped and split across the workers at document boundaries.')
+    parse_batch_parser.add_argument('--message-code', help='The message code of every file. If omitted, each message is parsed according to its Fedwire message element.')
+    parse_batch_parser.add_argument('--output-file', help='Path to output JSON Lines file.')
+    parse_batch_parser.add_argument('--reject-file', help='Path to JSON Lines file listing files that failed (default: <output>.rejects.jsonl).')
+    parse_batch_parser.add_argument('--workers', type=int, help='Number of worker processes (default: CPU count).')
+    parse_batch_parser.add_argument('--chunk-size', type=int, help='Files sent to a worker per task (default: 64). Archives are sent in 8 MB ranges instead.')
+    parse_batch_parser.add_argument('--completion-order', action='store_true', help='Write results as they complete instead of in input order.')
+    parse_batch_parser.set_defaults(func=handle_parse_batch)
+
+    # Schemas command
+    schemas_parser = subparsers.add_parser('schemas', help='Manage the on-disk schema cache.')
+    schemas_subparsers = schemas_parser.add_subparsers(dest='schemas_command', required=True, help='Available schema commands')
+    compile_parser = schemas_subparsers.add_parser('compile', help='Precompile envelope XSD files into the schema cache read by every process.')
+    compile_parser.add_argument('--xsd-file', required=True, action='append', help='Path to an envelope XSD file. May be repeated.')
+    compile_parser.add_argument('--cache-file', help='Path to the cache file (default: $MISO20022_SCHEMA_CACHE or ~/.cache/miso20022/schema_cache.json).')
+    compile_parser.set_defaults(func=handle_schemas_compile)
+
+    # Store command
+    store_parser = subparsers.add_parser('store', help='Query the SQLite message index filled by generate --store and parse --store.')
+    store_subparsers = store_parser.add_subparsers(dest='store_command', required=True, help='Available store commands')
+    outstanding_parser = store_subparsers.add_parser('outstanding', help='List the wires that have not received a pacs.002 status as JSON Lines.')
+    outstanding_parser.add_argument('--store', required=True, help='Path to the message index.')
+    outstanding_parser.add_argument('--older-than', type=float, default=0, help='Only wires recorded at least this many seconds ago.')
+    outstanding_parser.add_argument('--message-type', default='pacs.008', help='Message type (prefix) of the wires (default: pacs.008).')
+    outstanding_parser.add_argument('--limit', type=int, help='Maximum number of wires.')
+    outstanding_parser.add_argument('--output-file', help='Path to output JSON Lines file (default: standard output).')
+    outstanding_parser.set_defaults(func=handle_store_outstanding)
+    requests_parser = store_subparsers.add_parser('status-requests', help='Write a pacs.028 payload per outstanding wire, for generate-batch.')
+    requests_parser.add_argument('--store', required=True, help='Path to the message index.')
+    requests_parser.add_argument('--input-cycle-date', required=True, help='inputCycleDate of the status requests, e.g. 20250110.')
+    requests_parser.add_argument('--input-source', required=True, help='inputSource of the status requests.')
+    requests_parser.add_argument('--first-sequence-number', required=True, help='inputSequenceNumber of the first request; later requests count up with the same number of digits.')
+    requests_parser.add_argument('--older-than', type=float, default=0, help='Only wires recorded at least this many seconds ago.')
+    requests_parser.add_argument('--limit', type=int, help='Maximum number of requests.')
+    requests_parser.add_argument('--output-file', required=True, help='Path to output JSON Lines file.')
+    requests_parser.set_defaults(func=handle_store_status_requests)
+
     args = parser.parse_args()
-    args.func(args)
+    if args.profile:
+        from miso20022.profiling import run_profiled
+
+        output_prefix = args.profile_output or f"miso20022_{args.command}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        run_profiled(args.profile, lambda: args.func(args), output_prefix)
+    else:
+        args.func(args)
 
 if __name__ == '__main__':
     main()
@@ -2,22 +2,22 @@
 
 """Common account-related models used across ISO20022 messages."""
 
-from dataclasses import dataclass
+from miso20022.common.base import model
 
 
-@dataclass
+@model(frozen=True)
 class Othr:
     """Other account identification."""
     Id: str
 
 
-@dataclass
+@model(frozen=True)
 class IdAcct:
     """Account identification."""
     Othr: Othr
 
 
-@dataclass
+@model(frozen=True)
 class Account:
     """Base class for accounts."""
     Id: IdAcct
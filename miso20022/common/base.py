@@ -0,0 +1,65 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""Dataclass decorator for memory-compact ISO20022 models."""
+
+import sys
+from dataclasses import FrozenInstanceError, dataclass, fields
+
+
+def _frozen_setattr(self, name, value):
+    raise FrozenInstanceError(f"cannot assign to field {name!r}")
+
+
+def _frozen_delattr(self, name):
+    raise FrozenInstanceError(f"cannot delete field {name!r}")
+
+
+def _frozen_getstate(self):
+    return [getattr(self, f.name) for f in fields(self)]
+
+
+def _frozen_setstate(self, state):
+    for f, value in zip(fields(self), state):
+        object.__setattr__(self, f.name, value)
+
+
+def _add_slots(cls, frozen):
+    """Recreate a dataclass with __slots__ (dataclass(slots=True) is only available from Python 3.10)."""
+    cls_dict = dict(cls.__dict__)
+    field_names = tuple(f.name for f in fields(cls))
+    cls_dict['__slots__'] = field_names
+    for name in field_names:
+        # Class attributes holding the defaults would clash with the slot descriptors
+        cls_dict.pop(name, None)
+    cls_dict.pop('__dict__', None)
+    cls_dict.pop('__weakref__', None)
+
+    if frozen:
+        # The generated methods refer to the original class, so replace them
+        cls_dict['__setattr__'] = _frozen_setattr
+        cls_dict['__delattr__'] = _frozen_delattr
+        cls_dict['__getstate__'] = _frozen_getstate
+        cls_dict['__setstate__'] = _frozen_setstate
+
+    slotted = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    slotted.__qualname__ = cls.__qualname__
+    return slotted
+
+
+def model(cls=None, *, frozen: bool = False):
+    """
+    Declare an ISO20022 model: a dataclass with __slots__ and no per-instance __dict__.
+
+    The constructor, field order and asdict() output are the same as with @dataclass.
+
+    Args:
+        frozen: If True, instances are immutable (and hashable).
+    """
+    def wrap(cls):
+        if sys.version_info >= (3, 10):
+            return dataclass(cls, frozen=frozen, slots=True)
+        return _add_slots(dataclass(cls, frozen=frozen), frozen)
+
+    if cls is None:
+        return wrap
+    return wrap(cls)
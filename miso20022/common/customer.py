@@ -2,13 +2,13 @@
 
 """Common customer-related models used across ISO20022 messages."""
 
-from dataclasses import dataclass
 from typing import List, Optional
 
 from miso20022.common.account import IdAcct
+from miso20022.common.base import model
 
 
-@dataclass
+@model
 class PstlAdr:
     """Postal address information."""
     StrtNm: Optional[str] = None
@@ -28,20 +28,20 @@ class PstlAdr:
     SubDept: Optional[str] = None  # Added to handle SubDepartment field
 
 
-@dataclass
+@model(frozen=True)
 class ClrSysId:
     """Clearing system identification."""
     Cd: str = "USABA"
 
 
-@dataclass
+@model(frozen=True)
 class ClrSysMmbId:
     """Clearing system member identification."""
     ClrSysId: ClrSysId
     MmbId: str
 
 
-@dataclass
+@model
 class FinInstnId:
     """Financial institution identification."""
     ClrSysMmbId: ClrSysMmbId
@@ -49,51 +49,51 @@ class FinInstnId:
     PstlAdr: Optional[PstlAdr] = None
 
 
-@dataclass
+@model
 class InstgAgt:
     """Instructing agent."""
     FinInstnId: FinInstnId
 
 
-@dataclass
+@model
 class InstdAgt:
     """Instructed agent."""
     FinInstnId: FinInstnId
 
 
-@dataclass
+@model
 class DbtrAcct:
     """Debtor account."""
     Id: IdAcct
 
 
-@dataclass
+@model
 class CdtrAcct:
     """Creditor account."""
     Id: IdAcct
 
 
-@dataclass
+@model
 class Dbtr:
     """Debtor party."""
     Nm: str
     PstlAdr: PstlAdr
 
 
-@dataclass
+@model
 class Cdtr:
     """Creditor party."""
     Nm: str
     PstlAdr: PstlAdr
 
 
-@dataclass
+@model
 class DbtrAgt:
     """Debtor agent."""
     FinInstnId: FinInstnId
 
 
-@dataclass
+@model
 class CdtrAgt:
     """Creditor agent."""
     FinInstnId: FinInstnId
@@ -2,11 +2,13 @@
 
 """Common payment-related models used across ISO20022 messages."""
 
-from dataclasses import dataclass, field
+from dataclasses import field
 from typing import Any, Dict, Optional
 
+from miso20022.common.base import model
 
-@dataclass
+
+@model
 class PmtId:
     """Payment identification."""
     EndToEndId: str
@@ -15,34 +17,35 @@ class PmtId:
     TxId: Optional[str] = None
 
 
-@dataclass
+@model(frozen=True)
 class LclInstrm:
     """Local instrument."""
     Prtry: str = "CTRC"
 
 
-@dataclass
+@model
 class PmtTpInf:
     """Payment type information."""
     LclInstrm: LclInstrm
 
 
-@dataclass
+@model
 class SttlmInf:
     """Settlement information."""
     SttlmMtd: str = "CLRG"
     ClrSys: Dict[str, Any] = field(default_factory=lambda: {"Cd": "FDW"})
 
 
-@dataclass
+@model
 class GrpHdr:
     """Group header."""
     MsgId: str
     CreDtTm: str
     NbOfTxs: Optional[NbOfTxs] = None
+    CtrlSum: Optional[str] = None
     SttlmInf: Optional[SttlmInf] = None
 
-@dataclass
+@model
 class OrgnlGrpInf:
     """Original group information."""
     OrgnlMsgId: str
@@ -0,0 +1,483 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Duplicate detection for redelivered inbound messages, in fixed memory.
+
+DuplicateDetector keys every transaction of a message on its UETR, on the pair of
+group header MsgId and EndToEndId, and on the MsgId and EndToEndId on their own. Only
+the UETR or the full pair identify a payment: EndToEndId is chosen by the originator
+and a MsgId covers every transaction of a bulk message, so a match on either alone is
+only reported as probable. Each key first goes through a Bloom filter sized for the
+expected number of keys and false-positive rate; only keys the filter has (probably)
+seen are looked up in an exact LRU store of the most recent keys. The filter answers
+"new" for the vast majority of traffic with a few hashes, while the store confirms real
+redeliveries. Both are bounded, and the detector can be saved to and restored from a
+local snapshot file so that it survives restarts.
+"""
+
+import hashlib
+import json
+import math
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from lxml import etree
+
+# Message field -> path of the field; UETR and EndToEndId are read from every transaction
+DEDUP_FIELDS = {
+    'UETR': "CdtTrfTxInf/PmtId/UETR",
+    'EndToEndId': "CdtTrfTxInf/PmtId/EndToEndId",
+    'MsgId': "GrpHdr/MsgId",
+}
+
+# ISO 20022 placeholder for an EndToEndId the originator did not provide; never a key
+NOT_PROVIDED = 'NOTPROVIDED'
+
+# Transaction element holding the UETR and EndToEndId
+_TRANSACTION = 'CdtTrfTxInf'
+
+_SNAPSHOT_MAGIC = b'MISODDP1'
+_SNAPSHOT_VERSION = 1
+
+
+class BloomFilter:
+    """
+    A Bloom filter over str keys, sized for a capacity and a false-positive rate.
+
+    Positions are derived from one 128-bit BLAKE2b digest per key by double hashing.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        # Keys added, i.e. how full the filter is
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def add(self, key: str) -> bool:
+        """
+        Add a key.
+
+        Returns:
+            True if the key was (probably) already present.
+        """
+        bits = self.bits
+        present = True
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                present = False
+                bits[position >> 3] |= mask
+        if not present:
+            self.count += 1
+        return present
+
+    @property
+    def full(self) -> bool:
+        """True once the filter holds its capacity, beyond which the false-positive rate grows."""
+        return self.count >= self.capacity
+
+
+@dataclass
+class DuplicateCheck:
+    """
+    The outcome of checking one message.
+
+    Attributes:
+        keys: The key values by field (UETR, EndToEndId, MsgId) of each transaction of
+            the message; fields a transaction does not have are left out. A message
+            without transactions, e.g. a pacs.002, has a single entry with its MsgId.
+        duplicates: The identifying keys seen before, confirmed by the exact store, e.g.
+            "UETR 8a562c67-..." or "MsgId+EndToEndId 20250109MBANQ001000001/E2E1".
+        probable: Keys that may have been seen before: an identifying key the Bloom
+            filter has seen but the exact store no longer (or never) held, or a MsgId or
+            EndToEndId seen on its own. An older redelivery, a false positive, or a
+            different payment reusing the value.
+        duplicate_transactions: Number of transactions with a confirmed duplicate key.
+    """
+    keys: List[Dict[str, str]] = field(default_factory=list)
+    duplicates: List[str] = field(default_factory=list)
+    probable: List[str] = field(default_factory=list)
+    duplicate_transactions: int = 0
+    # Store keys of the message, recorded by DuplicateDetector.remember
+    store_keys: List[str] = field(default_factory=list, repr=False)
+
+    @property
+    def is_duplicate(self) -> bool:
+        """True when every transaction of the message is a confirmed duplicate."""
+        return bool(self.keys) and self.duplicate_transactions == len(self.keys)
+
+    def describe(self) -> str:
+        """A short description of the matching keys, for logs."""
+        return ', '.join(self.duplicates + [f"{key} (probable)" for key in self.probable])
+
+
+def _store_key(name: str, value: str) -> str:
+    return f"{name}:{value}"
+
+
+def _display_key(key: str) -> str:
+    return key.replace(':', ' ', 1)
+
+
+def _message_root(source) -> etree._Element:
+    """Parse a message source, see DuplicateDetector.message_keys."""
+    if isinstance(source, etree._Element):
+        return source
+    try:
+        if isinstance(source, str) and source.lstrip().startswith('<'):
+            return etree.fromstring(source.encode('utf-8'))
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return etree.fromstring(bytes(source))
+        return etree.parse(source).getroot()
+    except etree.XMLSyntaxError as e:
+        raise ValueError(f"Error parsing XML file: {e}")
+
+
+class DuplicateDetector:
+    """
+    Detect messages whose transactions have all been seen before.
+
+    A transaction is a duplicate when its UETR, or its pair of MsgId and EndToEndId, was
+    seen before. A MsgId or EndToEndId seen on its own, or a message only some of whose
+    transactions are duplicates, is reported as probable and is not a duplicate.
+
+    Memory is fixed by the arguments: two Bloom filter generations of about
+    1.44 * log2(1 / error_rate) bits per key of capacity each, plus at most
+    max_entries exact keys. The filter generation in use is retired once it holds
+    capacity keys or, with window set, once it is window seconds old; keys are
+    remembered for one to two generations.
+
+    Example:
+        with DuplicateDetector(snapshot_path='dedup.snapshot') as detector:
+            check = detector.check('incoming.xml')
+            if check.is_duplicate:
+                print(f"Redelivered: {check.describe()}")
+
+    Args:
+        capacity: Keys per Bloom filter generation, e.g. a day of traffic (up to four
+            keys per transaction with the default fields).
+        error_rate: False-positive rate of each Bloom filter generation.
+        max_entries: Keys kept in the exact LRU store.
+        window: Optional time window in seconds; keys older than this are forgotten by
+            the exact store, and the Bloom filter generation rotates at this age.
+        fields: The message fields to key on, a subset of DEDUP_FIELDS.
+        snapshot_path: Local file to restore the detector from (when it exists) and to
+            save it to with save() or on leaving a with block without an exception.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001, max_entries: int = 100_000,
+                 window: Optional[float] = None, fields: Iterable[str] = tuple(DEDUP_FIELDS),
+                 snapshot_path: Optional[str] = None):
+        self.fields = list(fields)
+        unknown = [name for name in self.fields if name not in DEDUP_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown dedup fields: {', '.join(unknown)}; expected {', '.join(DEDUP_FIELDS)}")
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.max_entries = max_entries
+        self.window = window
+        self.snapshot_path = snapshot_path
+        self._lock = threading.Lock()
+
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous: Optional[BloomFilter] = None
+        self._generation_started = time.time()
+        # Key -> time first seen, least recently seen first
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self.stats = {'checked': 0, 'duplicates': 0, 'probable': 0}
+
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load(snapshot_path)
+
+    def __enter__(self) -> "DuplicateDetector":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Keys of a failed run are not kept, so that its messages are not rejected when retried
+        if self.snapshot_path and exc_type is None:
+            self.save()
+
+    def _rotate(self, now: float):
+        if self._current.full or (self.window is not None and now - self._generation_started >= self.window):
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+            self._generation_started = now
+
+    def _lookup(self, key: str, now: float) -> Optional[str]:
+        """Report whether a key was seen before, without recording it; the lock must be held."""
+        first_seen = self._entries.get(key)
+        if first_seen is not None and (self.window is None or now - first_seen <= self.window):
+            return 'duplicate'
+        if key in self._current or (self._previous is not None and key in self._previous):
+            return 'probable'
+        return None
+
+    def _record(self, key: str, now: float):
+        """Record a key; the lock must be held."""
+        self._rotate(now)
+        self._current.add(key)
+        first_seen = self._entries.get(key)
+        if first_seen is None or (self.window is not None and now - first_seen > self.window):
+            self._entries[key] = now
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def seen(self, key: str, now: Optional[float] = None) -> Optional[str]:
+        """
+        Record a key and report whether it was seen before.
+
+        Args:
+            key: The key, e.g. "UETR:8a562c67-ca16-48ba-b074-65581be6f011".
+            now: Current time in seconds since the epoch. Defaults to time.time().
+
+        Returns:
+            None for a new key, 'duplicate' when the exact store has it, or 'probable'
+            when only the Bloom filter has it.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._rotate(now)
+            status = self._lookup(key, now)
+            self._record(key, now)
+        return status
+
+    def message_keys(self, source) -> List[Dict[str, str]]:
+        """
+        Read the key fields of every transaction of a message.
+
+        Args:
+            source: A file path, XML content as bytes or str, a binary file-like object,
+                or an lxml element (e.g. a FedwireFundsCustomerCreditTransfer element).
+
+        Returns:
+            The key values by field of each transaction, leaving out missing fields and
+            EndToEndId NOTPROVIDED. Every entry carries the message's MsgId. A message
+            without transactions yields a single entry with its MsgId, if it has one.
+
+        Raises:
+            ValueError: If the XML cannot be parsed.
+        """
+        root = _message_root(source)
+        msg_id = None
+        if 'MsgId' in self.fields:
+            group_header = next(root.iter('{*}GrpHdr'), None)
+            if group_header is not None:
+                msg_id = (group_header.findtext('{*}MsgId') or '').strip() or None
+
+        transactions = []
+        for transaction in root.iter(f'{{*}}{_TRANSACTION}'):
+            keys = {}
+            for name in self.fields:
+                if name == 'MsgId':
+                    continue
+                path = '/'.join(f'{{*}}{part}' for part in DEDUP_FIELDS[name].split('/')[1:])
+                value = (transaction.findtext(path) or '').strip()
+                if value and value != NOT_PROVIDED:
+                    keys[name] = value
+            if msg_id:
+                keys['MsgId'] = msg_id
+            transactions.append(keys)
+        if not transactions and msg_id:
+            transactions.append({'MsgId': msg_id})
+        return transactions
+
+    def check(self, source, now: Optional[float] = None, record: bool = True) -> DuplicateCheck:
+        """
+        Check a message against every message seen before, and remember it.
+
+        Args:
+            source: The message, see message_keys.
+            now: Current time in seconds since the epoch. Defaults to time.time().
+            record: If False, only check; pass the result to remember() once the message
+                has been processed.
+
+        Returns:
+            A DuplicateCheck; is_duplicate is True when every transaction was seen before.
+
+        Raises:
+            ValueError: If the XML cannot be parsed.
+        """
+        return self.check_keys(self.message_keys(source), now, record)
+
+    def check_keys(self, transactions: List[Dict[str, str]], now: Optional[float] = None,
+                   record: bool = True) -> DuplicateCheck:
+        """
+        Check key values that were read elsewhere, and remember them.
+
+        Args:
+            transactions: Key values by field of each transaction, e.g.
+                [{'UETR': '...', 'EndToEndId': '...', 'MsgId': '...'}].
+            now: Current time in seconds since the epoch. Defaults to time.time().
+            record: If False, only check; see check().
+
+        Returns:
+            A DuplicateCheck.
+        """
+        now = time.time() if now is None else now
+        result = DuplicateCheck(keys=[dict(keys) for keys in transactions])
+        with self._lock:
+            for keys in result.keys:
+                identifying = []
+                if 'UETR' in keys:
+                    identifying.append(_store_key('UETR', keys['UETR']))
+                if 'MsgId' in keys and 'EndToEndId' in keys:
+                    identifying.append(_store_key('MsgId+EndToEndId', f"{keys['MsgId']}/{keys['EndToEndId']}"))
+                partial = [_store_key(name, keys[name]) for name in ('EndToEndId', 'MsgId') if name in keys]
+
+                duplicate = False
+                for key in identifying:
+                    status = self._lookup(key, now)
+                    if status == 'duplicate':
+                        duplicate = True
+                        if _display_key(key) not in result.duplicates:
+                            result.duplicates.append(_display_key(key))
+                    elif status == 'probable' and _display_key(key) not in result.probable:
+                        result.probable.append(_display_key(key))
+                if duplicate:
+                    result.duplicate_transactions += 1
+                else:
+                    for key in partial:
+                        if self._lookup(key, now) and _display_key(key) not in result.probable:
+                            result.probable.append(_display_key(key))
+                for key in identifying + partial:
+                    if key not in result.store_keys:
+                        result.store_keys.append(key)
+
+            self.stats['checked'] += 1
+            if result.is_duplicate:
+                self.stats['duplicates'] += 1
+            elif result.duplicates or result.probable:
+                self.stats['probable'] += 1
+            if record:
+                for key in result.store_keys:
+                    self._record(key, now)
+        return result
+
+    def remember(self, check: DuplicateCheck, now: Optional[float] = None):
+        """
+        Record the keys of a message checked with record=False.
+
+        Args:
+            check: The result of check() or check_keys().
+            now: Current time in seconds since the epoch. Defaults to time.time().
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            for key in check.store_keys:
+                self._record(key, now)
+
+    def save(self, path: Optional[str] = None):
+        """
+        Write the detector to a snapshot file, replacing it atomically.
+
+        Args:
+            path: The snapshot file. Defaults to snapshot_path.
+
+        Raises:
+            ValueError: If no path is given or the file cannot be written.
+        """
+        path = path or self.snapshot_path
+        if not path:
+            raise ValueError("No snapshot path given")
+        with self._lock:
+            filters = [self._current] + ([self._previous] if self._previous is not None else [])
+            header = json.dumps({
+                'version': _SNAPSHOT_VERSION,
+                'capacity': self.capacity,
+                'error_rate': self.error_rate,
+                'generation_started': self._generation_started,
+                'counts': [bloom.count for bloom in filters],
+                'entries': list(self._entries.items()),
+            }).encode('utf-8')
+            chunks = [_SNAPSHOT_MAGIC, struct.pack('<Q', len(header)), header] + [bytes(bloom.bits) for bloom in filters]
+
+        directory = os.path.dirname(os.path.abspath(path))
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.dedup.')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in chunks:
+                        f.write(chunk)
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError as e:
+            raise ValueError(f"Error writing dedup snapshot {path}: {e}")
+
+    def load(self, path: str):
+        """
+        Restore the detector from a snapshot file written by save().
+
+        The exact store is always restored. The Bloom filters are restored only when the
+        snapshot was written with the same capacity and error_rate; otherwise they start
+        empty and a warning is printed.
+
+        Raises:
+            ValueError: If the file cannot be read or is not a dedup snapshot.
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            raise ValueError(f"Error reading dedup snapshot {path}: {e}")
+        try:
+            if not data.startswith(_SNAPSHOT_MAGIC):
+                raise ValueError("not a dedup snapshot")
+            offset = len(_SNAPSHOT_MAGIC)
+            (header_size,) = struct.unpack_from('<Q', data, offset)
+            offset += 8
+            header = json.loads(data[offset:offset + header_size])
+            offset += header_size
+            if header.get('version') != _SNAPSHOT_VERSION:
+                raise ValueError(f"unsupported snapshot version {header.get('version')}")
+        except (ValueError, struct.error) as e:
+            raise ValueError(f"Invalid dedup snapshot {path}: {e}")
+
+        with self._lock:
+            self._entries = OrderedDict(header['entries'][-self.max_entries:])
+            if header['capacity'] != self.capacity or header['error_rate'] != self.error_rate:
+                print(f"Dedup snapshot {path} was written with capacity {header['capacity']} and error rate "
+                      f"{header['error_rate']}; starting with empty Bloom filters", file=sys.stderr)
+                return
+            filters = []
+            for count in header['counts']:
+                bloom = BloomFilter(self.capacity, self.error_rate)
+                size = len(bloom.bits)
+                if len(data) < offset + size:
+                    raise ValueError(f"Invalid dedup snapshot {path}: truncated")
+                bloom.bits[:] = data[offset:offset + size]
+                bloom.count = count
+                offset += size
+                filters.append(bloom)
+            self._current = filters[0]
+            self._previous = filters[1] if len(filters) > 1 else None
+            self._generation_started = header['generation_started']
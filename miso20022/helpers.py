@@ -3,10 +3,12 @@
 """
 Utility to convert dictionaries to XML format.
 """
+from dataclasses import fields, is_dataclass
 from typing import Any, Dict, List, Union, Optional
-import xmltodict
 from lxml import etree
+import codecs
 import json
+import re
 
 def _remove_none_values(obj):
     """Remove None values from a dictionary recursively."""
@@ -61,51 +63,290 @@ def dict_to_xml(data: Union[Dict[str, Any], List[Any]], prefix, namespace, root:
         data[root_key]["@xmlns:" + prefix] = namespace
 
     # Generate XML without the XML declaration
+    import xmltodict
+
     return xmltodict.unparse(data, pretty=True, full_document=False)
 
-def parse_xml_to_json(xml_file_path: str) -> str:
-    """Parses an XML file and converts it to a JSON string."""
+def _set_value(element, value, ns):
+    """Populate an element from a dataclass, dictionary, or scalar value."""
+    if is_dataclass(value):
+        for field in fields(value):
+            _append_child(element, field.name, getattr(value, field.name), ns)
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            if item is None:
+                continue
+            if key == '#text':
+                element.text = _to_text(item)
+            elif key.startswith('@'):
+                # Namespace declarations are handled through the element nsmap
+                if not key.startswith('@xmlns'):
+                    element.set(key[1:], _to_text(item))
+            else:
+                _append_child(element, key, item, ns)
+    else:
+        element.text = _to_text(value)
+
+    # Keep empty elements as a start/end tag pair rather than a self-closing tag
+    if element.text is None and not len(element):
+        element.text = ''
+
+
+def _append_child(parent, name, value, ns):
+    """Append one child element per value, repeating the element for lists."""
+    if value is None:
+        return
+    if isinstance(value, (list, tuple)):
+        for item in value:
+            if item is not None:
+                _set_value(etree.SubElement(parent, ns + name), item, ns)
+    else:
+        _set_value(etree.SubElement(parent, ns + name), value, ns)
+
+
+def _to_text(value) -> str:
+    """Render a scalar value the same way xmltodict does."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value if isinstance(value, str) else str(value)
+
+
+def model_to_element(model: Any, tag: str, prefix: str, namespace: str) -> etree._Element:
+    """
+    Convert a dataclass model directly to an lxml element without building an intermediate dictionary.
+
+    Args:
+        model: Dataclass instance (or dictionary) holding the element content.
+        tag: Local name of the root element.
+        prefix: Namespace prefix to declare for all element tags.
+        namespace: Namespace URI of all element tags.
+
+    Returns:
+        The root lxml element.
+    """
+    ns = f"{{{namespace}}}"
+    root = etree.Element(ns + tag, nsmap={prefix: namespace})
+    _set_value(root, model, ns)
+    return root
+
+
+def element_to_xml(element: etree._Element) -> str:
+    """
+    Serialize an lxml element in the same tab-indented layout as dict_to_xml.
+
+    Args:
+        element: The element to serialize.
+
+    Returns:
+        Namespaced XML string without an XML declaration.
+    """
+    etree.indent(element, space='\t')
+    return etree.tostring(element, encoding='unicode')
+
+
+def element_to_bytes(element: etree._Element) -> bytes:
+    """
+    Serialize an lxml element as compact UTF-8, without indentation.
+
+    Args:
+        element: The element to serialize.
+
+    Returns:
+        Namespaced UTF-8 encoded XML without an XML declaration.
+    """
+    return etree.tostring(element, encoding='utf-8', xml_declaration=False)
+
+
+def element_to_dict(element) -> Dict[str, Any]:
+    """Recursively converts an lxml element to a dictionary."""
+    # Remove namespace from tag name
+    tag = etree.QName(element).localname
+
+    node_dict = {}
+
+    # Add attributes to the dictionary
+    if element.attrib:
+        node_dict['@attributes'] = {k: v for k, v in element.attrib.items()}
+
+    # Add child elements to the dictionary
+    children = element.getchildren()
+    if children:
+        for child in children:
+            child_tag, child_data = element_to_dict(child).popitem()
+            if child_tag in node_dict:
+                if not isinstance(node_dict[child_tag], list):
+                    node_dict[child_tag] = [node_dict[child_tag]]
+                node_dict[child_tag].append(child_data)
+            else:
+                node_dict[child_tag] = child_data
+
+    # Add text content to the dictionary
+    if element.text and element.text.strip():
+        text = element.text.strip()
+        if node_dict:  # If there are attributes or children, add text as a key
+            node_dict['#text'] = text
+        else:  # Otherwise, the element's value is just the text
+            node_dict = text
+
+    return {tag: node_dict}
+
+def load_xml_root(source) -> etree._Element:
+    """
+    Return the root element of an XML source without touching the disk unless given a path.
+
+    Args:
+        source: A file path, XML content as bytes or str, a binary file-like object,
+            or an already-parsed lxml element or element tree.
+
+    Returns:
+        The root lxml element.
+    """
+    if isinstance(source, etree._Element):
+        return source
+    if isinstance(source, etree._ElementTree):
+        return source.getroot()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return etree.fromstring(bytes(source))
+    if isinstance(source, str) and source.lstrip().startswith('<'):
+        # XML content rather than a path; encode so an encoding declaration is accepted
+        return etree.fromstring(source.encode('utf-8'))
+    return etree.parse(source).getroot()
+
+def parse_xml_root(source) -> etree._Element:
+    """Parses an XML source (see load_xml_root), reporting errors the same way as parse_xml_to_dict."""
     try:
-        tree = etree.parse(xml_file_path)
-        root = tree.getroot()
-
-        def element_to_dict(element):
-            """Recursively converts an lxml element to a dictionary."""
-            # Remove namespace from tag name
-            tag = etree.QName(element).localname
-
-            node_dict = {}
-
-            # Add attributes to the dictionary
-            if element.attrib:
-                node_dict['@attributes'] = {k: v for k, v in element.attrib.items()}
-
-            # Add child elements to the dictionary
-            children = element.getchildren()
-            if children:
-                for child in children:
-                    child_tag, child_data = element_to_dict(child).popitem()
-                    if child_tag in node_dict:
-                        if not isinstance(node_dict[child_tag], list):
-                            node_dict[child_tag] = [node_dict[child_tag]]
-                        node_dict[child_tag].append(child_data)
-                    else:
-                        node_dict[child_tag] = child_data
-
-            # Add text content to the dictionary
-            if element.text and element.text.strip():
-                text = element.text.strip()
-                if node_dict:  # If there are attributes or children, add text as a key
-                    node_dict['#text'] = text
-                else:  # Otherwise, the element's value is just the text
-                    node_dict = text
-
-            return {tag: node_dict}
-
-        xml_dict = element_to_dict(root)
-        return json.dumps(xml_dict, indent=4)
+        return load_xml_root(source)
 
     except etree.XMLSyntaxError as e:
         raise ValueError(f"Error parsing XML file: {e}")
     except Exception as e:
         raise IOError(f"Error reading file or processing XML: {e}")
+
+def parse_xml_to_dict(source) -> Dict[str, Any]:
+    """Parses an XML source (see load_xml_root) and converts it to a dictionary."""
+    root = parse_xml_root(source)
+    try:
+        return element_to_dict(root)
+
+    except Exception as e:
+        raise IOError(f"Error reading file or processing XML: {e}")
+
+def parse_xml_to_json(xml_file_path: str, compact: bool = False) -> str:
+    """Parses an XML file and converts it to a JSON string, compact (see json_backend) or indented."""
+    if compact:
+        from miso20022.json_backend import dumps
+
+        return dumps(parse_xml_to_dict(xml_file_path), compact=True)
+    return json.dumps(parse_xml_to_dict(xml_file_path), indent=4)
+
+
+class XMLDocumentStream:
+    """
+    Read-only file-like view that presents concatenated XML documents as one document.
+
+    XML declarations are dropped and the documents are wrapped in a synthetic root
+    element, so an archive of back-to-back messages can be fed to a single
+    incremental parser such as lxml.etree.iterparse. The wrapped document is UTF-8:
+    a document declaring another ASCII-compatible encoding (e.g. ISO-8859-1) is
+    transcoded, and other encodings such as UTF-16 are rejected with a ValueError.
+    """
+
+    ROOT_TAG = b'XMLDocumentStream'
+    _DECLARATION_START = b'<?xml'
+    _DECLARATION_END = b'?>'
+    # '<?xml' followed by whitespace, unlike e.g. an '<?xml-stylesheet' processing instruction
+    _DECLARATION = re.compile(rb'<\?xml\s')
+    _ENCODING = re.compile(rb'encoding\s*=\s*["\']([A-Za-z][A-Za-z0-9._-]*)["\']')
+
+    def __init__(self, source, chunk_size: int = 64 * 1024):
+        """
+        Args:
+            source: Binary file-like object to read from. A text file-like object is
+                read as already decoded text, whatever its declarations say.
+            chunk_size: Number of bytes to read from the source at a time.
+        """
+        self._source = source
+        self._chunk_size = chunk_size
+        self._buffer = b''
+        self._output = b'<' + self.ROOT_TAG + b'>'
+        self._eof = False
+        self._text = False
+        # Incremental decoder of the current document, or None when it is UTF-8
+        self._decoder = None
+
+    def _decode(self, data: bytes, final: bool = False) -> bytes:
+        """Transcode bytes of the current document to UTF-8."""
+        if self._decoder is None:
+            return data
+        return self._decoder.decode(data, final).encode('utf-8')
+
+    def _start_document(self, declaration: bytes) -> bytes:
+        """Switch to the encoding of a new document, returning what was left of the previous one."""
+        rest = self._decode(b'', final=True)
+        match = self._ENCODING.search(declaration)
+        self._decoder = None
+        if match is None or self._text:
+            return rest
+        name = match.group(1).decode('ascii')
+        try:
+            info = codecs.lookup(name)
+        except LookupError:
+            raise ValueError(f"Unknown XML encoding: {name}")
+        if info.name == 'utf-8':
+            return rest
+        if self._DECLARATION_START.decode('ascii').encode(info.name) != self._DECLARATION_START:
+            raise ValueError(f"Unsupported XML encoding {name}: only ASCII-compatible encodings "
+                             f"can be read from a multi-document stream")
+        self._decoder = info.incrementaldecoder()
+        return rest
+
+    def _drain(self, final: bool) -> bytes:
+        """Return the buffered bytes that are safe to emit, with XML declarations removed."""
+        parts = []
+        buffer = self._buffer
+        while True:
+            match = self._DECLARATION.search(buffer)
+            if match is None:
+                break
+            start = match.start()
+            end = buffer.find(self._DECLARATION_END, start)
+            if end == -1:
+                # The declaration continues in the next chunk; at the end of the
+                # source it is left in place so the parser reports it
+                parts.append(self._decode(buffer[:start] if not final else buffer, final))
+                self._buffer = b'' if final else buffer[start:]
+                return b''.join(parts)
+            parts.append(self._decode(buffer[:start]))
+            parts.append(self._start_document(buffer[start:end]))
+            buffer = buffer[end + len(self._DECLARATION_END):]
+
+        # Hold back a trailing '<?xml', or part of it, until the next chunk shows what follows
+        keep = 0
+        if not final:
+            for size in range(len(self._DECLARATION_START), 0, -1):
+                if buffer.endswith(self._DECLARATION_START[:size]):
+                    keep = size
+                    break
+        parts.append(self._decode(buffer[:len(buffer) - keep], final))
+        self._buffer = buffer[len(buffer) - keep:]
+        return b''.join(parts)
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to size bytes of the wrapped document."""
+        while not self._eof and (size < 0 or len(self._output) < size):
+            chunk = self._source.read(self._chunk_size)
+            if isinstance(chunk, str):
+                self._text = True
+                chunk = chunk.encode('utf-8')
+            if not chunk:
+                self._eof = True
+                self._output += self._drain(final=True) + b'</' + self.ROOT_TAG + b'>'
+            else:
+                self._buffer += chunk
+                self._output += self._drain(final=False)
+
+        if size < 0:
+            data, self._output = self._output, b''
+        else:
+            data, self._output = self._output[:size], self._output[size:]
+        return data
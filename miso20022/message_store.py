@@ -0,0 +1,357 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Local SQLite index of generated and received messages, for status correlation.
+
+MessageStore records one row per transaction of every pacs.008, pacs.002 and
+pacs.028 message it is given, indexed by message ID (the IMAD: inputCycleDate +
+inputSource + inputSequenceNumber), UETR and original message ID. A pacs.002 sets the
+status of the transactions it reports on, whichever of the two is recorded first, so
+matching a status report to its wire and listing the wires still waiting for one are
+index lookups instead of file scans. Outstanding wires can be turned into pacs.028
+status request payloads in bulk.
+
+The database uses write-ahead logging, so readers are not blocked by the writer, and
+rows are inserted in batches of batch_size per transaction.
+"""
+
+import io
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from lxml import etree
+
+from miso20022.extract import extract
+from miso20022.helpers import XMLDocumentStream
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    message_type TEXT NOT NULL,
+    msg_id TEXT NOT NULL,
+    creation_datetime TEXT,
+    uetr TEXT,
+    end_to_end_id TEXT,
+    instr_id TEXT,
+    amount TEXT,
+    currency TEXT,
+    sender_aba TEXT,
+    receiver_aba TEXT,
+    original_msg_id TEXT,
+    original_message_type TEXT,
+    status TEXT,
+    status_msg_id TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS messages_identity ON messages (message_type, msg_id, IFNULL(uetr, ''), IFNULL(end_to_end_id, ''));
+CREATE INDEX IF NOT EXISTS messages_msg_id ON messages (msg_id);
+CREATE INDEX IF NOT EXISTS messages_uetr ON messages (uetr);
+CREATE INDEX IF NOT EXISTS messages_original_msg_id ON messages (original_msg_id);
+CREATE INDEX IF NOT EXISTS messages_outstanding ON messages (status, message_type, recorded_at);
+"""
+
+_COLUMNS = ('message_type', 'msg_id', 'creation_datetime', 'uetr', 'end_to_end_id', 'instr_id', 'amount', 'currency',
+            'sender_aba', 'receiver_aba', 'original_msg_id', 'original_message_type', 'status', 'recorded_at')
+
+_AGENT_SELECTORS = {
+    'sender_aba': "InstgAgt/FinInstnId/ClrSysMmbId/MmbId",
+    'receiver_aba': "InstdAgt/FinInstnId/ClrSysMmbId/MmbId",
+}
+_ORIGINAL_SELECTORS = {
+    'uetr': "OrgnlUETR",
+    'end_to_end_id': "OrgnlEndToEndId",
+    'instr_id': "OrgnlInstrId",
+    'original_msg_id': "OrgnlGrpInf/OrgnlMsgId",
+    'original_message_type': "OrgnlGrpInf/OrgnlMsgNmId",
+    **_AGENT_SELECTORS,
+}
+# Message type prefix -> (transaction element, column -> selector relative to the transaction)
+TRANSACTION_LAYOUTS = {
+    'pacs.008': ('CdtTrfTxInf', {
+        'uetr': "PmtId/UETR",
+        'end_to_end_id': "PmtId/EndToEndId",
+        'instr_id': "PmtId/InstrId",
+        'amount': "IntrBkSttlmAmt",
+        'currency': "IntrBkSttlmAmt/@Ccy",
+        **_AGENT_SELECTORS,
+    }),
+    'pacs.002': ('TxInfAndSts', {**_ORIGINAL_SELECTORS, 'status': "TxSts"}),
+    'pacs.028': ('TxInf', _ORIGINAL_SELECTORS),
+}
+
+# Applies the latest status reported for a wire to its rows; run per message ID
+_APPLY_STATUS = """
+UPDATE messages SET (status, status_msg_id) = (
+    SELECT s.status, s.msg_id FROM messages AS s
+    WHERE s.original_msg_id = messages.msg_id AND s.status IS NOT NULL
+      AND (s.uetr IS NULL OR messages.uetr IS NULL OR s.uetr = messages.uetr)
+    ORDER BY s.id DESC LIMIT 1)
+WHERE msg_id = ? AND original_msg_id IS NULL AND EXISTS (
+    SELECT 1 FROM messages AS s
+    WHERE s.original_msg_id = messages.msg_id AND s.status IS NOT NULL
+      AND (s.uetr IS NULL OR messages.uetr IS NULL OR s.uetr = messages.uetr))
+"""
+
+
+def _iter_documents(source) -> Iterator[etree._Element]:
+    """Yield the ISO 20022 Document elements of a message, file or archive of messages."""
+    if isinstance(source, etree._Element):
+        yield from source.iter('{*}Document')
+        return
+    if isinstance(source, str) and source.lstrip().startswith('<'):
+        source = source.encode('utf-8')
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    if isinstance(source, str):
+        with open(source, 'rb') as f:
+            yield from _iter_documents(f)
+        return
+
+    try:
+        for _, element in etree.iterparse(XMLDocumentStream(source), events=('end',), tag='{*}Document'):
+            yield element
+            # Release the message and everything read before it
+            element.clear()
+            for ancestor in element.iterancestors():
+                while ancestor.getprevious() is not None:
+                    del ancestor.getparent()[0]
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+    except etree.XMLSyntaxError as e:
+        raise ValueError(f"Error parsing XML file: {e}")
+
+
+def document_rows(document: etree._Element, recorded_at: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Read the store rows of one ISO 20022 Document, one per transaction.
+
+    Args:
+        document: The Document element.
+        recorded_at: Time the message was recorded, in seconds since the epoch. Defaults to now.
+
+    Returns:
+        The rows as dictionaries keyed by column; empty for message types the store does not index.
+    """
+    message_type = (etree.QName(document).namespace or '').rsplit(':', 1)[-1]
+    layout = TRANSACTION_LAYOUTS.get(message_type[:8])
+    if layout is None:
+        return []
+    transaction_name, selectors = layout
+
+    header_selectors = ["GrpHdr/MsgId", "GrpHdr/CreDtTm"]
+    if message_type.startswith('pacs.002'):
+        # A pacs.002 may give the original message once for the group
+        header_selectors += ["OrgnlGrpInfAndSts/OrgnlMsgId", "OrgnlGrpInfAndSts/OrgnlMsgNmId"]
+    header = extract(document, header_selectors)
+    if not header["GrpHdr/MsgId"]:
+        raise ValueError(f"{message_type} message has no GrpHdr/MsgId")
+    base = {
+        'message_type': message_type,
+        'msg_id': header["GrpHdr/MsgId"],
+        'creation_datetime': header["GrpHdr/CreDtTm"],
+        'recorded_at': time.time() if recorded_at is None else recorded_at,
+    }
+
+    rows = []
+    for transaction in document.iter(f'{{*}}{transaction_name}'):
+        values = extract(transaction, selectors.values())
+        row = dict(base)
+        for column, selector in selectors.items():
+            row[column] = values[selector]
+        if not row.get('original_msg_id', True) and "OrgnlGrpInfAndSts/OrgnlMsgId" in header:
+            row['original_msg_id'] = header["OrgnlGrpInfAndSts/OrgnlMsgId"]
+            row['original_message_type'] = header["OrgnlGrpInfAndSts/OrgnlMsgNmId"]
+        rows.append(row)
+    return rows
+
+
+class MessageStore:
+    """
+    SQLite-backed index of messages by IMAD, UETR and status.
+
+    Example:
+        with MessageStore('messages.db') as store:
+            store.record_message('outgoing_pacs.008.xml')
+            store.record_message('inbound_pacs.002.xml')
+            for wire in store.outstanding(older_than=3600):
+                print(wire['msg_id'], wire['uetr'])
+
+    Args:
+        path: The database file; created when missing. ":memory:" keeps it in memory.
+        batch_size: Rows buffered before they are written in one transaction. Queries
+            and close() write the buffered rows first.
+    """
+
+    def __init__(self, path: str, batch_size: int = 500):
+        self.path = path
+        self.batch_size = batch_size
+        # Rows written since the store was opened; transactions already in the index are ignored
+        self.recorded = 0
+        self._pending: List[Dict[str, Any]] = []
+        self._connection = sqlite3.connect(path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # With WAL, a crash may lose the last transactions but never corrupts the database
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+    def __enter__(self) -> "MessageStore":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Write the buffered rows and close the database."""
+        self.flush()
+        self._connection.close()
+
+    def record_message(self, source, recorded_at: Optional[float] = None) -> int:
+        """
+        Record every pacs.008, pacs.002 and pacs.028 message in a source.
+
+        Args:
+            source: A file path, XML content as bytes or str, a binary file-like object,
+                or an lxml element. Files may hold one message, a FedwireFundsOutgoing
+                document with several, or concatenated documents.
+            recorded_at: Time the messages were sent or received, in seconds since the
+                epoch. Defaults to now.
+
+        Returns:
+            The number of transactions recorded.
+
+        Raises:
+            ValueError: If the XML cannot be parsed or a message has no MsgId.
+        """
+        count = 0
+        for document in _iter_documents(source):
+            rows = document_rows(document, recorded_at)
+            self._pending.extend(rows)
+            count += len(rows)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+        return count
+
+    def record_rows(self, rows: Iterable[Dict[str, Any]]):
+        """Record rows built elsewhere, with the columns of document_rows."""
+        for row in rows:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Write the buffered rows in one transaction and apply the statuses they carry."""
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        placeholders = ', '.join('?' for _ in _COLUMNS)
+        with self._connection:
+            inserted = self._connection.executemany(
+                f"INSERT OR IGNORE INTO messages ({', '.join(_COLUMNS)}) VALUES ({placeholders})",
+                [tuple(row.get(column) for column in _COLUMNS) for row in rows])
+            self.recorded += inserted.rowcount
+            # Wires that received a status, and wires whose status arrived before them
+            msg_ids = {row['original_msg_id'] for row in rows if row.get('status') and row.get('original_msg_id')}
+            msg_ids.update(row['msg_id'] for row in rows if not row.get('original_msg_id'))
+            self._connection.executemany(_APPLY_STATUS, [(msg_id,) for msg_id in msg_ids])
+
+    def _query(self, sql: str, parameters=()) -> List[Dict[str, Any]]:
+        self.flush()
+        return [dict(row) for row in self._connection.execute(sql, parameters)]
+
+    def find_by_imad(self, msg_id: str) -> List[Dict[str, Any]]:
+        """
+        Return the rows of the messages with a message ID.
+
+        Args:
+            msg_id: The IMAD as one string (inputCycleDate + inputSource + inputSequenceNumber).
+        """
+        return self._query("SELECT * FROM messages WHERE msg_id = ? ORDER BY id", (msg_id,))
+
+    def find_by_uetr(self, uetr: str) -> List[Dict[str, Any]]:
+        """Return every row for a UETR: the wire, its status reports and status requests."""
+        return self._query("SELECT * FROM messages WHERE uetr = ? ORDER BY id", (uetr,))
+
+    def correlate(self, source) -> List[Dict[str, Any]]:
+        """
+        Find the original wires a pacs.002 or pacs.028 message refers to.
+
+        Args:
+            source: The message, see record_message. It is not recorded.
+
+        Returns:
+            The rows of the original transactions, matched on OrgnlMsgId and, when both
+            sides have one, OrgnlUETR.
+        """
+        originals = []
+        for document in _iter_documents(source):
+            for row in document_rows(document):
+                if not row.get('original_msg_id'):
+                    continue
+                originals += self._query(
+                    "SELECT * FROM messages WHERE msg_id = ? AND original_msg_id IS NULL"
+                    " AND (? IS NULL OR uetr IS NULL OR uetr = ?) ORDER BY id",
+                    (row['original_msg_id'], row['uetr'], row['uetr']))
+        return originals
+
+    def outstanding(self, older_than: float = 0, message_type_prefix: str = 'pacs.008',
+                    limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Return the wires that have not received a status yet, oldest first.
+
+        Args:
+            older_than: Only wires recorded at least this many seconds ago.
+            message_type_prefix: Message types to consider, e.g. 'pacs.008'.
+            limit: Maximum number of rows.
+
+        Returns:
+            The rows, oldest first.
+        """
+        # A range on message_type, unlike LIKE, is answered from the messages_outstanding index
+        sql = ("SELECT * FROM messages WHERE status IS NULL AND message_type >= ? AND message_type < ?"
+               " AND recorded_at <= ? AND original_msg_id IS NULL ORDER BY recorded_at, id")
+        parameters: List[Any] = [message_type_prefix, message_type_prefix + '\uffff', time.time() - older_than]
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        return self._query(sql, parameters)
+
+
+def status_request_payloads(originals: Iterable[Dict[str, Any]], input_cycle_date: str, input_source: str,
+                            first_sequence_number: str) -> Iterator[Dict[str, Any]]:
+    """
+    Build pacs.028 payloads asking for the status of wires, e.g. MessageStore.outstanding().
+
+    Args:
+        originals: Rows of the original wires.
+        input_cycle_date: inputCycleDate of the status requests, e.g. "20250110".
+        input_source: inputSource of the status requests, e.g. "MBANQ".
+        first_sequence_number: inputSequenceNumber of the first request; the following
+            requests count up from it with the same number of digits, e.g. "000001".
+
+    Yields:
+        One payload per original wire, in the format Document.from_payload of
+        miso20022.pacs.pacs028 expects.
+    """
+    width = len(first_sequence_number)
+    sequence = int(first_sequence_number)
+    for original in originals:
+        yield {
+            "fedWireMessage": {
+                "inputMessageAccountabilityData": {
+                    "inputCycleDate": input_cycle_date,
+                    "inputSource": input_source,
+                    "inputSequenceNumber": f"{sequence:0{width}d}",
+                },
+                "senderDepositoryInstitution": {"senderABANumber": original['sender_aba']},
+                "receiverDepositoryInstitution": {"receiverABANumber": original['receiver_aba']},
+            },
+            "original_msg_id": original['msg_id'],
+            "original_msg_nm_id": original['message_type'],
+            "original_creation_datetime": original['creation_datetime'],
+            "original_instr_id": original['instr_id'],
+            "original_end_to_end_id": original['end_to_end_id'],
+            "original_uetr": original['uetr'],
+        }
+        sequence += 1
@@ -1,6 +1,6 @@
 # SPDX-License-Identifier: Apache-2.0
 
-from dataclasses import dataclass, asdict
+from dataclasses import asdict
 from datetime import datetime, timezone
 from typing import Any, Dict, Optional, List
 from uuid import uuid4
@@ -9,19 +9,20 @@ from miso20022.common import (
     PstlAdr, ClrSysId, ClrSysMmbId, FinInstnId,
     InstgAgt, InstdAgt, GrpHdr, OrgnlGrpInf
 )
+from miso20022.common.base import model
 
-@dataclass
+@model(frozen=True)
 class Rsn:
     Prtry: str
 
 
-@dataclass
+@model
 class StsRsnInf:
     Rsn: Rsn
     AddtlInf: str
     
 
-@dataclass
+@model
 class TxInfAndSts:
     OrgnlGrpInf: OrgnlGrpInf
     TxSts: str
@@ -40,7 +41,7 @@ class TxInfAndSts:
         if self.TxSts and self.TxSts not in allowed_values:
             raise ValueError(f"TxSts must be one of {allowed_values}, got {self.TxSts}")
 
-@dataclass
+@model
 class FIToFIPmtStsRpt:
     GrpHdr: GrpHdr
     TxInfAndSts: TxInfAndSts
@@ -1,16 +1,39 @@
 # SPDX-License-Identifier: Apache-2.0
 
-from dataclasses import dataclass, asdict
+from dataclasses import asdict
 from datetime import datetime, timezone
+from decimal import Decimal
 from random import choices
 from string import ascii_letters, digits
-from typing import Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple, Union
 from uuid import uuid4
 
 from miso20022.common import *
+from miso20022.common.base import model
 
+if TYPE_CHECKING:
+    from lxml import etree
 
-@dataclass
+
+def _message_id(msg: Dict[str, Any]) -> str:
+    """Build the message ID from the input message accountability data."""
+    imad = msg["inputMessageAccountabilityData"]
+    return f"{imad['inputCycleDate']}{imad['inputSource']}{imad['inputSequenceNumber']}"
+
+
+def _adr_lines(personal: Dict[str, Any]) -> List[str]:
+    """Helper for address lines."""
+    lines = []
+    for key in ("addressLineOne", "addressLineTwo", "addressLineThree"):
+        val = personal["address"].get(key, "").replace("NA", "").strip()
+        if val:
+            if len(val) > 32:
+                raise ValueError(f"Address line '{key}' ('{val}') exceeds 32 characters.")
+            lines.append(val)
+    return lines
+
+
+@model
 class CdtTrfTxInf:
     """Credit transfer transaction information."""
     PmtId: Optional[PmtId] = None
@@ -49,12 +72,96 @@ class CdtTrfTxInf:
             PstlAdr=PstlAdr(**data['PstlAdr']) if data.get('PstlAdr') else None
         )
 
+    @classmethod
+    def from_payload(
+            cls,
+            payload: Dict[str, Any],
+            instg_agt: Optional["InstgAgt"] = None,
+            instd_agt: Optional["InstdAgt"] = None
+    ) -> "CdtTrfTxInf":
+        """Create one credit transfer transaction from a payload dictionary.
+
+        Args:
+            payload: The payload data as a dictionary.
+            instg_agt: Instructing agent shared by a group of transactions. Built from the payload if omitted.
+            instd_agt: Instructed agent shared by a group of transactions. Built from the payload if omitted.
+
+        Returns:
+            A CdtTrfTxInf instance.
+        """
+        msg = payload["fedWireMessage"]
+        imad = msg["inputMessageAccountabilityData"]
+
+        # Generate random EndToEndId
+        prefix = "MEtoEID"
+        rand = ''.join(choices(ascii_letters + digits, k=15 - len(prefix)))
+        end_to_end = prefix + rand
+        uetr = str(uuid4())
+
+        # Convert amount cents → dollars
+        amt = float(msg["amount"]["amount"]) / 100
+        ccy_amt = {"@Ccy": msg["amount"].get("currency", "USD"), "#text": str(amt)}
 
-@dataclass
+        # Format settlement date
+        sttlm_dt = datetime.strptime(imad["inputCycleDate"], "%Y%m%d").strftime("%Y-%m-%d")
+
+        sender_aba = msg["senderDepositoryInstitution"]["senderABANumber"]
+        receiver_aba = msg["receiverDepositoryInstitution"]["receiverABANumber"]
+
+        return cls(
+            PmtId=PmtId(EndToEndId=end_to_end, UETR=uetr),
+            PmtTpInf=PmtTpInf(LclInstrm=LclInstrm()),
+            IntrBkSttlmAmt=ccy_amt,
+            IntrBkSttlmDt=sttlm_dt,
+            InstdAmt=ccy_amt,
+            ChrgBr="SLEV",
+            InstgAgt=instg_agt or InstgAgt(
+                FinInstnId=FinInstnId(
+                    ClrSysMmbId=ClrSysMmbId(ClrSysId(), sender_aba),
+                )
+            ),
+            InstdAgt=instd_agt or InstdAgt(
+                FinInstnId=FinInstnId(
+                    ClrSysMmbId=ClrSysMmbId(ClrSysId(), receiver_aba)
+                )
+            ),
+            Dbtr=Dbtr(
+                Nm=msg["originator"]["personal"]["name"],
+                PstlAdr=PstlAdr(AdrLine=_adr_lines(msg["originator"]["personal"]))
+            ),
+            DbtrAcct=DbtrAcct(
+                Id=IdAcct(Othr=Othr(Id=msg["originator"]["personal"]["identifier"]))
+            ),
+            DbtrAgt=DbtrAgt(
+                FinInstnId=FinInstnId(
+                    ClrSysMmbId=ClrSysMmbId(ClrSysId(), sender_aba),
+                    Nm=msg["senderDepositoryInstitution"]["senderShortName"],
+                    PstlAdr=PstlAdr(AdrLine=_adr_lines(msg["originator"]["personal"]))
+                )
+            ),
+            CdtrAgt=CdtrAgt(
+                FinInstnId=FinInstnId(
+                    ClrSysMmbId=ClrSysMmbId(ClrSysId(), receiver_aba),
+                    Nm=msg["receiverDepositoryInstitution"]["receiverShortName"],
+                    PstlAdr=PstlAdr(AdrLine=_adr_lines(msg["beneficiary"]["personal"]))
+                )
+            ),
+            Cdtr=Cdtr(
+                Nm=msg["beneficiary"]["personal"]["name"],
+                PstlAdr=PstlAdr(AdrLine=_adr_lines(msg["beneficiary"]["personal"]))
+            ),
+            CdtrAcct=CdtrAcct(
+                Id=IdAcct(Othr=Othr(Id=msg["beneficiary"]["personal"]["identifier"]))
+            )
+        )
+
+
+@model
 class FIToFICstmrCdtTrf:
     """Financial institution to financial institution customer credit transfer."""
     GrpHdr: GrpHdr
-    CdtTrfTxInf: CdtTrfTxInf
+    # A list when the message groups several transactions
+    CdtTrfTxInf: Union[CdtTrfTxInf, List[CdtTrfTxInf]]
     
     def __post_init__(self):
         """Validate that SttlmInf is provided for PACS.008 messages."""
@@ -62,14 +169,21 @@ class FIToFICstmrCdtTrf:
             raise ValueError("SttlmInf is required for PACS.008 messages")
 
     @classmethod
-    def from_iso20022(cls, data: Dict[str, Any]) -> "CdtTrfTxInf":
+    def from_iso20022(cls, data: Dict[str, Any]) -> Tuple[GrpHdr, Union[CdtTrfTxInf, List[CdtTrfTxInf]]]:
 
         # 1. Extract CdtTrfTxInf data
         cdt_trf_tx_inf_data = data['FedwireFundsOutgoing']['FedwireFundsOutgoingMessage']['FedwireFundsCustomerCreditTransfer']['Document']['FIToFICstmrCdtTrf']['CdtTrfTxInf']
         grp_hdr_data = data['FedwireFundsOutgoing']['FedwireFundsOutgoingMessage']['FedwireFundsCustomerCreditTransfer']['Document']['FIToFICstmrCdtTrf']['GrpHdr']
 
-        # 2. Instantiate the CdtTrfTxInf data class with optional DbtrAcct and CdtrAcct
+        # 2. Instantiate the data classes; a message with several transactions gives a list
         grp_hdr_data = GrpHdr(**grp_hdr_data)
+        if isinstance(cdt_trf_tx_inf_data, list):
+            return grp_hdr_data, [cls._cdt_trf_tx_inf_from_dict(item) for item in cdt_trf_tx_inf_data]
+        return grp_hdr_data, cls._cdt_trf_tx_inf_from_dict(cdt_trf_tx_inf_data)
+
+    @staticmethod
+    def _cdt_trf_tx_inf_from_dict(cdt_trf_tx_inf_data: Dict[str, Any]) -> CdtTrfTxInf:
+        """Instantiate one CdtTrfTxInf data class with optional DbtrAcct and CdtrAcct."""
         cdt_trf_tx_inf = {
             'PmtId': PmtId(**cdt_trf_tx_inf_data['PmtId']),
             'PmtTpInf': PmtTpInf(LclInstrm=LclInstrm(**cdt_trf_tx_inf_data['PmtTpInf']['LclInstrm'])),
@@ -93,12 +207,10 @@ class FIToFICstmrCdtTrf:
             'CdtrAcct': CdtrAcct(Id=IdAcct(Othr=Othr(**cdt_trf_tx_inf_data['CdtrAcct']['Id']['Othr']))) if 'CdtrAcct' in cdt_trf_tx_inf_data and 'Id' in cdt_trf_tx_inf_data['CdtrAcct'] and 'Othr' in cdt_trf_tx_inf_data['CdtrAcct']['Id'] else None,
         }
         
-        cdt_trf_tx_inf = CdtTrfTxInf(**cdt_trf_tx_inf)
+        return CdtTrfTxInf(**cdt_trf_tx_inf)
 
-        return grp_hdr_data, cdt_trf_tx_inf
 
-
-@dataclass
+@model
 class Document:
     """PACS.008 document."""
     FIToFICstmrCdtTrf: FIToFICstmrCdtTrf
@@ -112,98 +224,95 @@ class Document:
             }
         }
 
+    def to_element(self) -> "etree._Element":
+        """Convert this model directly to an lxml element for XML generation."""
+        from miso20022.helpers import model_to_element
+
+        return model_to_element(self, "Document", "pacs", "urn:iso:std:iso:20022:tech:xsd:pacs.008.001.08")
+
     @classmethod
     def from_payload(cls, payload: Dict[str, Any]) -> "Document":
         msg = payload["fedWireMessage"]
-        imad = msg["inputMessageAccountabilityData"]
 
-        # Build message ID
-        message_id = f"{imad['inputCycleDate']}{imad['inputSource']}{imad['inputSequenceNumber']}"
+        # Build all submodels
+        grp_hdr = GrpHdr(
+            MsgId=_message_id(msg),
+            CreDtTm=datetime.now(timezone.utc).isoformat(),
+            NbOfTxs="1",
+            SttlmInf=SttlmInf()
+        )
+        cdt = CdtTrfTxInf.from_payload(payload)
 
-        # Generate random EndToEndId
-        prefix = "MEtoEID"
-        rand = ''.join(choices(ascii_letters + digits, k=15 - len(prefix)))
-        end_to_end = prefix + rand
-        uetr = str(uuid4())
+        return cls(FIToFICstmrCdtTrf=FIToFICstmrCdtTrf(GrpHdr=grp_hdr, CdtTrfTxInf=cdt))
 
-        # Convert amount cents → dollars
-        amt = float(msg["amount"]["amount"]) / 100
-        ccy_amt = {"@Ccy": msg["amount"].get("currency", "USD"), "#text": str(amt)}
+    @staticmethod
+    def build_group_header(payloads: Iterable[Dict[str, Any]]) -> GrpHdr:
+        """
+        Build the group header shared by the transactions of several payloads.
 
-        # Format settlement date
-        sttlm_dt = datetime.strptime(imad["inputCycleDate"], "%Y%m%d").strftime("%Y-%m-%d")
+        The payloads are read once, so a re-iterable source (e.g. a file reader) can be
+        passed again afterwards to build the transactions one at a time.
 
-        # Helper for address lines
-        def adr_lines(personal: Dict[str, Any]) -> List[str]:
-            lines = []
-            for key in ("addressLineOne", "addressLineTwo", "addressLineThree"):
-                val = personal["address"].get(key, "").replace("NA", "").strip()
-                if val:
-                    if len(val) > 32:
-                        raise ValueError(f"Address line '{key}' ('{val}') exceeds 32 characters.")
-                    lines.append(val)
-            return lines
+        Args:
+            payloads: Fedwire payload dictionaries, one per transaction.
 
-        # Build all submodels
-        grp_hdr = GrpHdr(
-            MsgId=message_id,
+        Returns:
+            A GrpHdr with the message ID of the first payload and NbOfTxs and CtrlSum set for the group.
+        """
+        first = None
+        nb_of_txs = 0
+        ctrl_sum = Decimal(0)
+        for payload in payloads:
+            msg = payload["fedWireMessage"]
+            if first is None:
+                first = msg
+            elif (msg["senderDepositoryInstitution"]["senderABANumber"] != first["senderDepositoryInstitution"]["senderABANumber"]
+                    or msg["receiverDepositoryInstitution"]["receiverABANumber"] != first["receiverDepositoryInstitution"]["receiverABANumber"]):
+                raise ValueError(f"Payload {nb_of_txs} does not share the sender and receiver ABA numbers of the group.")
+            nb_of_txs += 1
+            ctrl_sum += Decimal(str(msg["amount"]["amount"]))
+
+        if first is None:
+            raise ValueError("At least one payload is required to build a PACS.008 document.")
+
+        return GrpHdr(
+            MsgId=_message_id(first),
             CreDtTm=datetime.now(timezone.utc).isoformat(),
-            #Need to change this and make it dynamic
-            NbOfTxs="1",
+            NbOfTxs=str(nb_of_txs),
+            CtrlSum=f"{ctrl_sum / 100:.2f}",
             SttlmInf=SttlmInf()
         )
 
-        cdt = CdtTrfTxInf(
-            PmtId=PmtId(EndToEndId=end_to_end, UETR=uetr),
-            PmtTpInf=PmtTpInf(LclInstrm=LclInstrm()),
-            IntrBkSttlmAmt=ccy_amt,
-            IntrBkSttlmDt=sttlm_dt,
-            InstdAmt=ccy_amt,
-            ChrgBr="SLEV",
-            InstgAgt=InstgAgt(
-                FinInstnId=FinInstnId(
-                    ClrSysMmbId=ClrSysMmbId(ClrSysId(), msg["senderDepositoryInstitution"]["senderABANumber"]),
-                )
-            ),
-            InstdAgt=InstdAgt(
-                FinInstnId=FinInstnId(
-                    ClrSysMmbId=ClrSysMmbId(
-                        ClrSysId(),
-                        msg["receiverDepositoryInstitution"]["receiverABANumber"]
-                    )
-                )
-            ),
-            Dbtr=Dbtr(
-                Nm=msg["originator"]["personal"]["name"],
-                PstlAdr=PstlAdr(AdrLine=adr_lines(msg["originator"]["personal"]))
-            ),
-            DbtrAcct=DbtrAcct(
-                Id=IdAcct(Othr=Othr(Id=msg["originator"]["personal"]["identifier"]))
-            ),
-            DbtrAgt=DbtrAgt(
-                FinInstnId=FinInstnId(
-                    ClrSysMmbId=ClrSysMmbId(ClrSysId(), msg["senderDepositoryInstitution"]["senderABANumber"]),
-                    Nm=msg["senderDepositoryInstitution"]["senderShortName"],
-                    PstlAdr=PstlAdr(AdrLine=adr_lines(msg["originator"]["personal"]))
-                )
-            ),
-            CdtrAgt=CdtrAgt(
-                FinInstnId=FinInstnId(
-                    ClrSysMmbId=ClrSysMmbId(ClrSysId(), msg["receiverDepositoryInstitution"]["receiverABANumber"]),
-                    Nm=msg["receiverDepositoryInstitution"]["receiverShortName"],
-                    PstlAdr=PstlAdr(AdrLine=adr_lines(msg["beneficiary"]["personal"]))
-                )
-            ),
-            Cdtr=Cdtr(
-                Nm=msg["beneficiary"]["personal"]["name"],
-                PstlAdr=PstlAdr(AdrLine=adr_lines(msg["beneficiary"]["personal"]))
-            ),
-            CdtrAcct=CdtrAcct(
-                Id=IdAcct(Othr=Othr(Id=msg["beneficiary"]["personal"]["identifier"]))
-            )
-        )
+    @staticmethod
+    def build_group_agents(payload: Dict[str, Any]) -> Tuple[InstgAgt, InstdAgt]:
+        """Build the instructing and instructed agents shared by a group of transactions."""
+        msg = payload["fedWireMessage"]
+        instg_agt = InstgAgt(FinInstnId=FinInstnId(
+            ClrSysMmbId=ClrSysMmbId(ClrSysId(), msg["senderDepositoryInstitution"]["senderABANumber"])
+        ))
+        instd_agt = InstdAgt(FinInstnId=FinInstnId(
+            ClrSysMmbId=ClrSysMmbId(ClrSysId(), msg["receiverDepositoryInstitution"]["receiverABANumber"])
+        ))
+        return instg_agt, instd_agt
 
-        return cls(FIToFICstmrCdtTrf=FIToFICstmrCdtTrf(GrpHdr=grp_hdr, CdtTrfTxInf=cdt))
+    @classmethod
+    def from_payloads(cls, payloads: List[Dict[str, Any]]) -> "Document":
+        """
+        Create one PACS.008 document holding a credit transfer per payload.
 
-    
-    
+        The payloads share a group header: the message ID is taken from the first payload,
+        and all of them must have the same sender and receiver depository institutions.
+        The instructing and instructed agents and the settlement information are built
+        once and shared by every transaction.
+
+        Args:
+            payloads: Fedwire payload dictionaries, one per transaction.
+
+        Returns:
+            A Document with NbOfTxs and CtrlSum set for the group.
+        """
+        grp_hdr = cls.build_group_header(payloads)
+        instg_agt, instd_agt = cls.build_group_agents(payloads[0])
+        transactions = [CdtTrfTxInf.from_payload(payload, instg_agt, instd_agt) for payload in payloads]
+
+        return cls(FIToFICstmrCdtTrf=FIToFICstmrCdtTrf(GrpHdr=grp_hdr, CdtTrfTxInf=transactions))
@@ -1,16 +1,20 @@
 # SPDX-License-Identifier: Apache-2.0
 
-from dataclasses import dataclass, asdict
+from dataclasses import asdict
 from datetime import datetime, timezone
-from typing import Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Dict, Optional
 from uuid import uuid4
 
 from miso20022.common import (
     PstlAdr, ClrSysId, ClrSysMmbId, FinInstnId,
     InstgAgt, InstdAgt, GrpHdr, OrgnlGrpInf
 )
+from miso20022.common.base import model
 
-@dataclass
+if TYPE_CHECKING:
+    from lxml import etree
+
+@model
 class TxInf:
     """Transaction information."""
     OrgnlGrpInf: OrgnlGrpInf
@@ -21,14 +25,14 @@ class TxInf:
     InstdAgt: Optional[InstdAgt] = None
 
 
-@dataclass
+@model
 class FIToFIPmtStsReq:
     """Financial Institution to Financial Institution Payment Status Request."""
     GrpHdr: GrpHdr
     TxInf: TxInf
 
 
-@dataclass
+@model
 class Document:
     """PACS.028 document."""
     FIToFIPmtStsReq: FIToFIPmtStsReq
@@ -42,6 +46,12 @@ class Document:
             }
         }
 
+    def to_element(self) -> "etree._Element":
+        """Convert this model directly to an lxml element for XML generation."""
+        from miso20022.helpers import model_to_element
+
+        return model_to_element(self, "Document", "pacs", "urn:iso:std:iso:20022:tech:xsd:pacs.028.001.03")
+
     @classmethod
     def from_payload(
         cls,
@@ -0,0 +1,226 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+CPU and memory profiling of CLI commands (miso20022 --profile=cpu|mem ...).
+
+The CPU profile runs the command under cProfile and writes the raw statistics
+(<prefix>.pstats, readable with pstats or snakeviz) and collapsed stacks
+(<prefix>.collapsed, one "frame;frame;frame microseconds" line per stack, readable by
+flamegraph.pl, speedscope or inferno).
+
+The memory profile traces allocations with tracemalloc. At the end of every stage
+reported through miso20022.instrumentation (parse, model build, serialization, ...) it
+reads the traced memory counters, and it snapshots the allocations only when the run
+starts and ends. It reports the peak and net memory per stage and the top allocation
+sites of the run to <prefix>.memory.txt.
+
+Both only see the CLI process itself: work done in the worker processes of
+generate-batch and parse-batch is not included.
+"""
+
+import cProfile
+import importlib
+import linecache
+import os
+import pstats
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from miso20022.instrumentation import stage_hook
+
+# Rows printed to stderr, and allocation sites reported per stage
+TOP_ENTRIES = 20
+
+# Modules loaded before allocations are traced, so that the stages show the cost of
+# processing messages rather than of importing the models
+PRELOADED_MODULES = ('miso20022.fedwire', 'miso20022.json_backend', 'miso20022.validation')
+
+# Stacks deeper than this are cut when deriving collapsed stacks from cProfile data
+MAX_STACK_DEPTH = 100
+
+
+def run_profiled(mode: str, func: Callable[[], Any], output_prefix: str):
+    """
+    Run a function under the CPU or memory profiler and write the profile.
+
+    The profile is written even when the function exits through sys.exit.
+
+    Args:
+        mode: 'cpu' or 'mem'.
+        func: The function to run, without arguments.
+        output_prefix: Path prefix of the profile files.
+
+    Returns:
+        The return value of func.
+    """
+    if mode == 'cpu':
+        return _run_cpu_profile(func, output_prefix)
+    if mode == 'mem':
+        return _run_memory_profile(func, output_prefix)
+    raise ValueError(f"Unknown profile mode: {mode}")
+
+
+def _run_cpu_profile(func: Callable[[], Any], output_prefix: str):
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func)
+    finally:
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        stats.dump_stats(f"{output_prefix}.pstats")
+        write_collapsed_stacks(stats, f"{output_prefix}.collapsed")
+        stats.sort_stats('cumulative').print_stats(TOP_ENTRIES)
+        print(f"CPU profile written to {output_prefix}.pstats and {output_prefix}.collapsed", file=sys.stderr)
+
+
+def _frame_name(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == '~':
+        # Built-in functions, e.g. "<method 'read' of '_io.BufferedReader' objects>"
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def write_collapsed_stacks(stats: pstats.Stats, path: str) -> int:
+    """
+    Write cProfile statistics as collapsed stacks for flamegraph tools.
+
+    cProfile records caller/callee pairs rather than whole stacks, so stacks are
+    rebuilt from the call graph: a function's time is split between its callers in
+    proportion to the cumulative time each call edge accounts for. Recursive calls are
+    folded into their first occurrence on a stack.
+
+    Args:
+        stats: The profile statistics.
+        path: Output file path.
+
+    Returns:
+        The number of stacks written.
+    """
+    # func -> (self seconds, cumulative seconds), and caller -> {callee: cumulative seconds of the edge}
+    totals: Dict[Tuple[str, int, str], Tuple[float, float]] = {}
+    callees: Dict[Tuple[str, int, str], Dict[Tuple[str, int, str], float]] = {}
+    roots = []
+    for func, (_, _, self_time, cumulative, callers) in stats.stats.items():
+        totals[func] = (self_time, cumulative)
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge[3]
+
+    stacks: Dict[str, int] = {}
+
+    def walk(func, scale: float, stack: List[str], on_stack: set):
+        self_time, cumulative = totals[func]
+        stack.append(_frame_name(func))
+        on_stack.add(func)
+        micros = int(self_time * scale * 1e6)
+        if micros:
+            key = ';'.join(stack)
+            stacks[key] = stacks.get(key, 0) + micros
+        if len(stack) < MAX_STACK_DEPTH:
+            for callee, edge_time in callees.get(func, {}).items():
+                callee_cumulative = totals[callee][1]
+                if callee in on_stack or not callee_cumulative or not edge_time:
+                    continue
+                walk(callee, scale * min(1.0, edge_time / callee_cumulative), stack, on_stack)
+        stack.pop()
+        on_stack.discard(func)
+
+    for root in roots:
+        walk(root, 1.0, [], set())
+
+    with open(path, 'w', encoding='utf-8') as f:
+        for key, micros in sorted(stacks.items()):
+            f.write(f"{key} {micros}\n")
+    return len(stacks)
+
+
+class _StageMemory:
+    """
+    Stage hook recording the traced memory of every stage.
+
+    Each call only reads the tracemalloc counters, so it costs about as little as the
+    stages being measured. Allocation sites come from two full snapshots, taken when
+    the run starts and when it ends.
+    """
+
+    def __init__(self, filters):
+        self.filters = filters
+        self.start = self._snapshot()
+        self.current = tracemalloc.get_traced_memory()[0]
+        _reset_peak()
+        # Stage -> [runs, peak bytes, net bytes allocated]
+        self.stages: Dict[str, List[int]] = {}
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(self.filters)
+
+    def __call__(self, stage: str, message_code: str, duration: float, size: Optional[int] = None):
+        if stage == 'total':
+            return
+        self.record(stage)
+
+    def record(self, stage: str):
+        """Attribute the memory traced since the previous stage to a stage."""
+        current, peak = tracemalloc.get_traced_memory()
+        entry = self.stages.setdefault(stage, [0, 0, 0])
+        entry[0] += 1
+        entry[1] = max(entry[1], peak)
+        entry[2] += current - self.current
+        self.current = current
+        _reset_peak()
+
+    def report(self) -> str:
+        lines = []
+        for stage, (runs, peak, net) in self.stages.items():
+            lines.append(f"Stage {stage}: {runs} run(s), peak traced memory {peak / 1024:.1f} KiB, "
+                         f"net {net / 1024:+.1f} KiB")
+        lines.append("")
+        lines.append("Top allocation sites over the run:")
+        top = sorted(self._snapshot().compare_to(self.start, 'lineno'), key=lambda diff: diff.size_diff, reverse=True)
+        for diff in top[:TOP_ENTRIES]:
+            if diff.size_diff <= 0:
+                break
+            frame = diff.traceback[0]
+            source = linecache.getline(frame.filename, frame.lineno).strip()
+            lines.append(f"  {diff.size_diff / 1024:10.1f} KiB {diff.count_diff:8d} blocks  {frame.filename}:{frame.lineno}  {source}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+def _reset_peak():
+    # Without reset_peak (Python < 3.9) each stage reports the peak of the whole run so far
+    if hasattr(tracemalloc, 'reset_peak'):
+        tracemalloc.reset_peak()
+
+
+def _run_memory_profile(func: Callable[[], Any], output_prefix: str):
+    for module_name in PRELOADED_MODULES:
+        importlib.import_module(module_name)
+    started = tracemalloc.is_tracing()
+    if not started:
+        tracemalloc.start()
+    # Allocations of the profiler itself are left out of the report
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, linecache.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ]
+    memory = _StageMemory(filters)
+    try:
+        with stage_hook(memory):
+            return func()
+    finally:
+        # Whatever ran after the last stage, e.g. writing the output file
+        memory.record('after_stages')
+        report = memory.report()
+        if not started:
+            tracemalloc.stop()
+        with open(f"{output_prefix}.memory.txt", 'w', encoding='utf-8') as f:
+            f.write(report)
+        print(report, file=sys.stderr)
+        print(f"Memory profile written to {output_prefix}.memory.txt", file=sys.stderr)
@@ -0,0 +1,149 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+On-disk cache of compiled envelope indexes, shared by every process.
+
+`miso20022 schemas compile --xsd-file envelope.xsd` writes the envelope index of each
+XSD file to a versioned JSON cache file. load_envelope_index then looks the file up by
+the SHA-256 of its content before compiling it, so a short-lived CLI invocation or a
+fresh webapp worker reads the index instead of parsing the XSD. An edited XSD file has
+a different hash and is simply compiled again; a cache written by another format
+version is ignored.
+
+The cache file is MISO20022_SCHEMA_CACHE when set, otherwise
+$XDG_CACHE_HOME/miso20022/schema_cache.json (~/.cache/... by default).
+"""
+
+import hashlib
+import io
+import json
+import os
+import tempfile
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Bumped whenever the file layout or the envelope index format changes
+CACHE_VERSION = 1
+
+
+def default_cache_path() -> str:
+    """Return the cache file path from MISO20022_SCHEMA_CACHE or the user cache directory."""
+    path = os.environ.get('MISO20022_SCHEMA_CACHE')
+    if path:
+        return path
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'miso20022', 'schema_cache.json')
+
+
+def content_hash(content: bytes) -> str:
+    """Return the cache key of an XSD file's content."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def read_cache(cache_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Read a cache file.
+
+    Args:
+        cache_path: The cache file. Defaults to default_cache_path().
+
+    Returns:
+        The cache contents, or an empty cache if the file is missing, unreadable or
+        written by another CACHE_VERSION.
+    """
+    empty = {'version': CACHE_VERSION, 'envelopes': {}}
+    try:
+        with open(cache_path or default_cache_path(), 'rb') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return empty
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION:
+        return empty
+    return cache
+
+
+@lru_cache(maxsize=4)
+def _loaded_envelopes(cache_path: str) -> Dict[str, Dict[str, Any]]:
+    return read_cache(cache_path).get('envelopes', {})
+
+
+def lookup_envelope_index(content: bytes, cache_path: Optional[str] = None) -> Optional[Dict[str, Tuple[str, str, str, str]]]:
+    """
+    Return the cached envelope index for an XSD file's content.
+
+    The cache file is read once per process.
+
+    Args:
+        content: The bytes of the XSD file.
+        cache_path: The cache file. Defaults to default_cache_path().
+
+    Returns:
+        The envelope index (see miso20022.fedwire.compile_envelope_index), or None if
+        the content is not in the cache.
+    """
+    entry = _loaded_envelopes(cache_path or default_cache_path()).get(content_hash(content))
+    if entry is None:
+        return None
+    return {message_code: tuple(envelope) for message_code, envelope in entry['index'].items()}
+
+
+def clear_loaded_cache():
+    """Forget the cache files read by this process, so the next lookup reads them again."""
+    _loaded_envelopes.cache_clear()
+
+
+def compile_cache(xsd_paths: Iterable[str], cache_path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Compile the envelope index of XSD files into the cache file.
+
+    Entries for other files are kept; an entry previously compiled from the same path
+    with different content is replaced.
+
+    Args:
+        xsd_paths: The envelope XSD files.
+        cache_path: The cache file. Defaults to default_cache_path().
+
+    Returns:
+        The entries written, keyed by content hash.
+
+    Raises:
+        ValueError: If an XSD file cannot be read or parsed, or the cache cannot be written.
+    """
+    from miso20022.fedwire import compile_envelope_index
+
+    cache_path = cache_path or default_cache_path()
+    cache = read_cache(cache_path)
+    envelopes = cache['envelopes']
+
+    written = {}
+    for xsd_path in xsd_paths:
+        xsd_path = os.path.abspath(xsd_path)
+        try:
+            with open(xsd_path, 'rb') as f:
+                content = f.read()
+        except OSError as e:
+            raise ValueError(f"Error parsing XSD file: {e}")
+        key = content_hash(content)
+        for stale in [k for k, entry in envelopes.items() if entry['path'] == xsd_path and k != key]:
+            del envelopes[stale]
+        envelopes[key] = written[key] = {'path': xsd_path, 'index': compile_envelope_index(io.BytesIO(content))}
+
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # Written next to the cache and renamed, so concurrent readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.schema_cache.')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, indent=1, sort_keys=True)
+            # mkstemp creates the file readable by its owner only; the cache is shared
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, cache_path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    except OSError as e:
+        raise ValueError(f"Error writing schema cache {cache_path}: {e}")
+
+    clear_loaded_cache()
+    return written
@@ -0,0 +1,101 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+XSD validation of generated ISO 20022 messages with a process-wide compiled schema cache.
+"""
+
+import os
+import threading
+from functools import lru_cache
+from typing import List, Optional
+
+from lxml import etree
+
+# Directory holding the ISO 20022 XSD files (head.001.001.03.xsd, pacs.008.001.08.xsd, ...)
+SCHEMA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'schemas'))
+
+APPHDR_MESSAGE_CODE = "urn:iso:std:iso:20022:tech:xsd:head.001.001.03"
+
+
+class CompiledSchema:
+    """A compiled XMLSchema that can be shared between threads."""
+
+    def __init__(self, xsd_path: str):
+        self.xsd_path = xsd_path
+        self._schema = etree.XMLSchema(etree.parse(xsd_path))
+        # The schema error log is per instance, so validations are serialized
+        self._lock = threading.Lock()
+
+    def validate(self, element: etree._Element) -> List[str]:
+        """
+        Validate an element against the schema.
+
+        Args:
+            element: The lxml element (or element tree) to validate.
+
+        Returns:
+            A list of validation error messages, empty if the element is valid.
+        """
+        with self._lock:
+            if self._schema.validate(element):
+                return []
+            # Trees built in memory have no line numbers
+            return [f"Line {error.line}: {error.message}" if error.line else error.message
+                    for error in self._schema.error_log]
+
+
+@lru_cache(maxsize=None)
+def _load_schema(xsd_path):
+    return CompiledSchema(xsd_path)
+
+
+def load_schema(xsd_path: str) -> CompiledSchema:
+    """
+    Return the compiled schema for an XSD file, compiling it only once per process.
+
+    Args:
+        xsd_path: Path to the XSD file.
+
+    Returns:
+        The CompiledSchema for the file.
+
+    Raises:
+        ValueError: If the XSD file cannot be read or compiled.
+    """
+    try:
+        return _load_schema(os.path.abspath(xsd_path))
+    except (OSError, etree.XMLSyntaxError, etree.XMLSchemaParseError) as e:
+        raise ValueError(f"Error loading XSD file {xsd_path}: {e}")
+
+
+def schema_path(message_code: str, schema_dir: Optional[str] = None) -> str:
+    """
+    Return the path of the XSD file for a message code.
+
+    Args:
+        message_code: The ISO20022 message code (e.g., urn:iso:std:iso:20022:tech:xsd:pacs.008.001.08).
+        schema_dir: Directory holding the XSD files. Defaults to SCHEMA_DIR.
+
+    Returns:
+        The path of the XSD file, e.g. schemas/pacs.008.001.08.xsd.
+    """
+    return os.path.join(schema_dir or SCHEMA_DIR, f"{message_code.split(':')[-1]}.xsd")
+
+
+def validate_message(app_hdr: etree._Element, document: etree._Element, message_code: str,
+                     schema_dir: Optional[str] = None) -> List[str]:
+    """
+    Validate a generated AppHdr and Document against head.001.001.03 and the message schema.
+
+    Args:
+        app_hdr: The AppHdr element.
+        document: The Document element.
+        message_code: The ISO20022 message code of the Document.
+        schema_dir: Directory holding the XSD files. Defaults to SCHEMA_DIR.
+
+    Returns:
+        A list of validation error messages, empty if both parts are valid.
+    """
+    errors = [f"AppHdr {error}" for error in load_schema(schema_path(APPHDR_MESSAGE_CODE, schema_dir)).validate(app_hdr)]
+    errors += [f"Document {error}" for error in load_schema(schema_path(message_code, schema_dir)).validate(document)]
+    return errors
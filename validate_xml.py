@@ -5,57 +5,76 @@
 Validate ISO20022 XML files against their XSD schemas.
 """
 
+import mmap
 import sys
 import re
 from lxml import etree
 
+from miso20022.fedwire import detect_message_code
+from miso20022.validation import load_schema
+
+
+def search_file(xml_file, pattern):
+    """Search a file for a bytes pattern through a memory mapping, without reading it into memory."""
+    with open(xml_file, 'rb') as f:
+        try:
+            content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            return None
+        with content:
+            match = re.search(pattern, content, re.DOTALL)
+            return match.group(0).decode('utf-8') if match else None
+
 
 def extract_document_xml(xml_file):
     """Extract the Document XML from a file containing both AppHdr and Document."""
-    with open(xml_file, 'r') as f:
-        content = f.read()
-
     # Find Document tag
-    match = re.search(r'<(?:\w+:)?Document[^>]*>.*?</(?:\w+:)?Document>', content, re.DOTALL)
-    if match:
-        return match.group(0)
+    document = search_file(xml_file, rb'<(?:\w+:)?Document[^>]*>.*?</(?:\w+:)?Document>')
+    if document:
+        return document
     else:
         raise ValueError(f"Could not find Document XML in {xml_file}")
 
 
 def extract_apphdr_xml(xml_file):
     """Extract the AppHdr XML from a file containing both AppHdr and Document."""
-    with open(xml_file, 'r') as f:
-        content = f.read()
-
     # Find AppHdr tag
-    match = re.search(r'<(?:\w+:)?AppHdr[^>]*>.*?</(?:\w+:)?AppHdr>', content, re.DOTALL)
-    if match:
-        return match.group(0)
+    apphdr = search_file(xml_file, rb'<(?:\w+:)?AppHdr[^>]*>.*?</(?:\w+:)?AppHdr>')
+    if apphdr:
+        return apphdr
     else:
         raise ValueError(f"Could not find AppHdr XML in {xml_file}")
 
 
+def find_element(root, local_name):
+    """Find the first element with the given local name, in any namespace."""
+    return next(root.iter(f"{{*}}{local_name}"), None)
+
+
 def validate_xml(xml_content, xsd_file):
-    """Validate XML content against an XSD schema."""
+    """Validate XML content (a string or an lxml element) against an XSD schema."""
     try:
-        xmlschema_doc = etree.parse(xsd_file)
-        xmlschema = etree.XMLSchema(xmlschema_doc)
+        # Compiled once per process and reused for every validation
+        xmlschema = load_schema(xsd_file)
         
         # Parse the XML content
-        xml_doc = etree.fromstring(xml_content.encode('utf-8'))
+        if isinstance(xml_content, str):
+            xml_doc = etree.fromstring(xml_content.encode('utf-8'))
+        else:
+            xml_doc = xml_content
         
         # Validate against the schema
-        is_valid = xmlschema.validate(xml_doc)
+        errors = xmlschema.validate(xml_doc)
         
-        if is_valid:
+        if not errors:
             print("✅ XML is valid according to schema!")
             return True
         else:
             print("❌ XML is invalid according to schema!")
             print("Validation errors:")
-            for error in xmlschema.error_log:
-                print(f"  Line {error.line}: {error.message}")
+            for error in errors:
+                print(f"  {error}")
             return False
 
     except etree.XMLSyntaxError as e:
@@ -70,18 +89,17 @@ def validate_xml(xml_content, xsd_file):
 
 
 def detect_message_type(xml_file):
-    """Detect the message type from the XML file."""
-    with open(xml_file, 'r') as f:
-        content = f.read()
-    
-    # Check for pacs.028
-    if 'pacs.028.001.03' in content:
-        return 'pacs.028'
-    # Check for pacs.008
-    elif 'pacs.008.001.08' in content:
-        return 'pacs.008'
-    else:
+    """Detect the message type from the start of the XML file."""
+    return detect_message_type_from_content(xml_file)
+
+
+def detect_message_type_from_content(content):
+    """Detect the message type (e.g. 'pacs.008') from XML content, a path or a parsed element."""
+    message_code = detect_message_code(content)
+    if message_code is None:
         return None
+    # urn:iso:std:iso:20022:tech:xsd:pacs.008.001.08 -> pacs.008
+    return '.'.join(message_code.split(':')[-1].split('.')[:2])
 
 
 if __name__ == "__main__":
@@ -96,33 +114,39 @@ if __name__ == "__main__":
     pacs008_xsd = "schemas/pacs.008.001.08.xsd"
     pacs028_xsd = "schemas/pacs.028.001.03.xsd"
     
-    # Detect message type
-    message_type = detect_message_type(xml_file)
+    # Parse the file once, letting lxml read it in chunks; the AppHdr and Document are
+    # validated in place
+    try:
+        root = etree.parse(xml_file).getroot()
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    except etree.XMLSyntaxError as e:
+        print(f"❌ XML syntax error: {e}")
+        sys.exit(1)
+    message_type = detect_message_type_from_content(root)
     
     # Validate AppHdr
     print("Validating AppHdr...")
     try:
-        apphdr_xml = extract_apphdr_xml(xml_file)
-        validate_xml(apphdr_xml, apphdr_xsd)
+        apphdr = find_element(root, 'AppHdr')
+        if apphdr is None:
+            raise ValueError(f"Could not find AppHdr XML in {xml_file}")
+        validate_xml(apphdr, apphdr_xsd)
     except Exception as e:
         print(f"Error validating AppHdr: {str(e)}")
     
     # Validate Document based on message type
-    if message_type == 'pacs.008':
-        print("\nValidating PACS.008 Document...")
-        try:
-            document_xml = extract_document_xml(xml_file)
-            validate_xml(document_xml, pacs008_xsd)
-        except Exception as e:
-            print(f"Error validating PACS.008: {str(e)}")
-    
-    elif message_type == 'pacs.028':
-        print("\nValidating PACS.028 Document...")
+    document_xsds = {'pacs.008': pacs008_xsd, 'pacs.028': pacs028_xsd}
+    if message_type in document_xsds:
+        print(f"\nValidating {message_type.upper()} Document...")
         try:
-            document_xml = extract_document_xml(xml_file)
-            validate_xml(document_xml, pacs028_xsd)
+            document = find_element(root, 'Document')
+            if document is None:
+                raise ValueError(f"Could not find Document XML in {xml_file}")
+            validate_xml(document, document_xsds[message_type])
         except Exception as e:
-            print(f"Error validating PACS.028: {str(e)}")
+            print(f"Error validating {message_type.upper()}: {str(e)}")
     
     else:
         print("\nUnknown message type. Please specify a valid ISO20022 message type.")
@@ -8,49 +8,121 @@ This web application allows users to upload an XSD file and JSON payload
 to generate ISO20022 messages.
 """
 
+import io
 import os
 import sys
 import json
 import tempfile
-from flask import Flask, request, render_template, jsonify, send_file
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from flask import Flask, Response, request, render_template, jsonify, send_file, has_request_context, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from werkzeug.utils import secure_filename
 
 # Add the parent directory to the path to ensure imports work correctly
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import the fedwire module functions
+from miso20022.batch import GenerateWorker, ParseContentWorker, run_batch, split_fedwire_messages
 from miso20022.fedwire import generate_fedwire_message
+from miso20022.json_backend import dumps_bytes
+from miso20022.validation import SCHEMA_DIR
 from webapp.parser import parse_xml_message
+from webapp.schema_registry import SchemaRegistry, message_code_for
+
+
+class BackendJSONProvider(DefaultJSONProvider):
+    """Encode jsonify responses with miso20022.json_backend (orjson when installed)."""
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj, compact=self._compact()), mimetype=self.mimetype)
+
+    def _compact(self) -> bool:
+        # A 'compact' request value (e.g. ?compact=1) wins; otherwise indent only in debug mode, as Flask does
+        flag = request.values.get('compact') if has_request_context() else None
+        if flag is not None:
+            return flag.lower() in ('1', 'true', 'yes', 'on')
+        return not self._app.debug
+
 
 app = Flask(__name__)
+app.json = BackendJSONProvider(app)
 app.config['UPLOAD_FOLDER'] = tempfile.mkdtemp()
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
+# Directory of ISO 20022 XSD files, and envelope XSDs (separated by os.pathsep) served by name
+app.config['SCHEMA_DIR'] = os.environ.get('MISO20022_SCHEMA_DIR', SCHEMA_DIR)
+app.config['ENVELOPE_XSD'] = os.environ.get('MISO20022_ENVELOPE_XSD', '')
+# Generated messages kept in memory for /download
+app.config['GENERATED_CACHE_SIZE'] = 256
+# Worker processes shared by the batch endpoints, and records sent to a worker at a time
+app.config['BATCH_WORKERS'] = int(os.environ.get('MISO20022_BATCH_WORKERS') or os.cpu_count() or 1)
+app.config['BATCH_CHUNK_SIZE'] = 16
+
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
 
 # Ensure the upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Envelope indexes and validators are compiled once, not per request
+schema_registry = SchemaRegistry.from_config(app.config)
+# Recently generated messages for /download; the threaded server shares them between requests
+generated_messages = OrderedDict()
+generated_messages_lock = threading.Lock()
+
+# Started on the first batch request and reused by every later one
+_batch_executor = None
+_batch_executor_lock = threading.Lock()
+
+
+def batch_executor() -> ProcessPoolExecutor:
+    """Return the process pool of the batch endpoints, starting it if needed."""
+    global _batch_executor
+    with _batch_executor_lock:
+        if _batch_executor is None:
+            _batch_executor = ProcessPoolExecutor(max_workers=app.config['BATCH_WORKERS'])
+        return _batch_executor
+
+
+def stream_batch_results(records, worker):
+    """Run a batch over the shared pool and yield one NDJSON line per message, payload or failed record."""
+    ordered = request.args.get('ordered', '1').lower() not in ('0', 'false', 'no', 'off')
+    try:
+        for result in run_batch(worker, records, app.config['BATCH_WORKERS'], app.config['BATCH_CHUNK_SIZE'],
+                                ordered=ordered, executor=batch_executor()):
+            if result.error:
+                yield dumps_bytes({'record': result.name, 'error': result.error}, compact=True) + b'\n'
+            elif isinstance(result.output, list):
+                for payload in result.output:
+                    yield dumps_bytes({'record': result.name, 'payload': payload}, compact=True) + b'\n'
+            else:
+                yield dumps_bytes({'record': result.name, 'message': result.output}, compact=True) + b'\n'
+    except Exception as e:
+        # The status line has already been sent; report why the rest of the batch is missing
+        yield dumps_bytes({'error': f'Batch aborted: {e}'}, compact=True) + b'\n'
+
+
+def ndjson_lines(stream):
+    """Yield (line number, line) for the non-blank lines of a request body."""
+    for line_number, line in enumerate(stream, start=1):
+        if line.strip():
+            yield str(line_number), line
+
 @app.route('/')
 def index():
     """Render the main page."""
     return render_template('index.html')
 
+@app.route('/schemas')
+def list_schemas():
+    """List the envelopes and ISO 20022 schema versions that requests can reference."""
+    return jsonify(schema_registry.describe())
+
 @app.route('/generate', methods=['POST'])
 def generate_message():
-    """Generate an ISO20022 message from the uploaded XSD and JSON payload."""
+    """Generate an ISO20022 message from a registered (or uploaded) envelope XSD and a JSON payload."""
     try:
-        # Check if XSD file was uploaded
-        if 'xsd_file' not in request.files:
-            return jsonify({'error': 'No XSD file uploaded'}), 400
-        
-        xsd_file = request.files['xsd_file']
-        if xsd_file.filename == '':
-            return jsonify({'error': 'No XSD file selected'}), 400
-        
-        # Save the XSD file
-        xsd_filename = secure_filename(xsd_file.filename)
-        xsd_path = os.path.join(app.config['UPLOAD_FOLDER'], xsd_filename)
-        xsd_file.save(xsd_path)
-        
         # Get message code, environment, and Fed ABA
         message_code = request.form.get('message_code')
         environment = request.form.get('environment')
@@ -58,15 +130,27 @@ def generate_message():
         
         if not all([message_code, environment, fed_aba]):
             return jsonify({'error': 'Missing required fields: message_code, environment, or fed_aba'}), 400
+        # Accept a schema version such as pacs.008.001.08 as well as the full message code
+        message_code = message_code_for(message_code)
+
+        if 'xsd_file' in request.files and request.files['xsd_file'].filename != '':
+            # An uploaded envelope XSD is still accepted, at the cost of a write and a parse
+            xsd_file = request.files['xsd_file']
+            xsd_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(xsd_file.filename))
+            xsd_file.save(xsd_path)
+        else:
+            try:
+                xsd_path = schema_registry.envelope_path(request.form.get('envelope'), message_code)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
         
         # Get payload - either from file upload or text input
         payload = None
         if 'payload_file' in request.files and request.files['payload_file'].filename != '':
-            payload_file = request.files['payload_file']
-            payload_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(payload_file.filename))
-            payload_file.save(payload_path)
-            with open(payload_path, 'r') as f:
-                payload = json.load(f)
+            try:
+                payload = json.load(request.files['payload_file'].stream)
+            except json.JSONDecodeError:
+                return jsonify({'error': 'Invalid JSON payload'}), 400
         elif 'payload_text' in request.form and request.form['payload_text'].strip():
             try:
                 payload = json.loads(request.form['payload_text'])
@@ -76,22 +160,27 @@ def generate_message():
             return jsonify({'error': 'No payload provided'}), 400
         
         # Generate the message
+        validate = request.form.get('validate', '').lower() in ('1', 'true', 'yes', 'on')
         app_hdr_xml, document_xml, complete_message = generate_fedwire_message(
             message_code=message_code,
             payload=payload,
             xsd_path=xsd_path,
             environment=environment,
-            fed_aba=fed_aba
+            fed_aba=fed_aba,
+            validate=validate,
+            schema_dir=schema_registry.schema_dir
         )
         
         if not complete_message:
             return jsonify({'error': 'Failed to generate message'}), 500
         
-        # Save the generated message to a temporary file
-        output_filename = f"{message_code.split(':')[-1]}_{os.path.basename(xsd_filename).split('.')[0]}.xml"
-        output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-        with open(output_path, 'w') as f:
-            f.write(complete_message)
+        # Keep the generated message for /download, dropping the oldest beyond the cache size
+        output_filename = f"{message_code.split(':')[-1]}_{os.path.basename(xsd_path).split('.')[0]}.xml"
+        with generated_messages_lock:
+            generated_messages[output_filename] = complete_message
+            generated_messages.move_to_end(output_filename)
+            while len(generated_messages) > app.config['GENERATED_CACHE_SIZE']:
+                generated_messages.popitem(last=False)
         
         return jsonify({
             'message': 'Message generated successfully',
@@ -109,6 +198,64 @@ def generate_message():
 
 
 
+@app.route('/generate/batch', methods=['POST'])
+def generate_batch_messages():
+    """
+    Generate one message per NDJSON payload in the request body, streaming NDJSON results.
+
+    Query parameters: message_code, environment, fed_aba, envelope, validate and ordered.
+    Each result line is {"record": <line number>, "message": <xml>} or {"record": ..., "error": ...}.
+    """
+    message_code = request.args.get('message_code')
+    environment = request.args.get('environment')
+    fed_aba = request.args.get('fed_aba')
+    if not all([message_code, environment, fed_aba]):
+        return jsonify({'error': 'Missing required query parameters: message_code, environment, or fed_aba'}), 400
+    message_code = message_code_for(message_code)
+    try:
+        xsd_path = schema_registry.envelope_path(request.args.get('envelope'), message_code)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    validate = request.args.get('validate', '').lower() in ('1', 'true', 'yes', 'on')
+    worker = GenerateWorker(message_code, environment, fed_aba, xsd_path, validate, schema_registry.schema_dir)
+    records = ndjson_lines(request.stream)
+    return Response(stream_with_context(stream_batch_results(records, worker)), mimetype='application/x-ndjson')
+
+@app.route('/parse/batch', methods=['POST'])
+def parse_batch_messages():
+    """
+    Parse a multi-message XML body, or NDJSON XML records, streaming NDJSON payloads.
+
+    An XML body may hold one FedwireFundsOutgoing document with many messages or many
+    concatenated documents; records are numbered by message. With an NDJSON body
+    (Content-Type application/x-ndjson), each line is a JSON string or an object with an
+    "xml" member holding a complete document; records are numbered by line.
+    Query parameters: message_code (optional filter) and ordered.
+    Each result line is {"record": ..., "payload": {...}} or {"record": ..., "error": ...}.
+    """
+    message_code = request.args.get('message_code')
+    message_code = message_code_for(message_code) if message_code else None
+
+    if request.mimetype in NDJSON_MIMETYPES:
+        def records():
+            for name, line in ndjson_lines(request.stream):
+                try:
+                    record = json.loads(line)
+                    xml = record['xml'] if isinstance(record, dict) else record
+                    if not isinstance(xml, str):
+                        raise TypeError('not a string')
+                except (ValueError, KeyError, TypeError) as e:
+                    raise ValueError(f'Invalid NDJSON record on line {name}: {e}')
+                yield name, xml.encode('utf-8')
+
+        worker = ParseContentWorker(message_code)
+        return Response(stream_with_context(stream_batch_results(records(), worker)), mimetype='application/x-ndjson')
+
+    # Messages are split off the stream here and parsed in the pool; other types are skipped while splitting
+    records = split_fedwire_messages(request.stream, message_code)
+    return Response(stream_with_context(stream_batch_results(records, ParseContentWorker())), mimetype='application/x-ndjson')
+
 @app.route('/parse', methods=['POST'])
 def parse_file():
     """Parse an uploaded ISO20022 XML file."""
@@ -116,13 +263,11 @@ def parse_file():
         return jsonify({'error': 'No file selected'}), 400
 
     file = request.files['xmlFile']
-    message_code = request.form.get('message_code')
-
-    if not message_code:
-        return jsonify({'error': 'Message code is required'}), 400
+    # Optional: detected from the message when not given
+    message_code = request.form.get('message_code') or None
 
     try:
-        xml_content = file.read().decode('utf-8')
+        xml_content = file.read()
         parsed_dict = parse_xml_message(xml_content, message_code)
         return jsonify(parsed_dict)
     except Exception as e:
@@ -130,10 +275,15 @@ def parse_file():
 
 @app.route('/download/<filename>')
 def download_file(filename):
-    """Download the generated XML file."""
+    """Download a recently generated XML message."""
     try:
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], secure_filename(filename))
-        return send_file(file_path, as_attachment=True)
+        filename = secure_filename(filename)
+        with generated_messages_lock:
+            message = generated_messages.get(filename)
+        if message is None:
+            return jsonify({'error': f'Error downloading file: {filename} not found'}), 404
+        content = message.encode('utf-8')
+        return send_file(io.BytesIO(content), mimetype='application/xml', as_attachment=True, download_name=filename)
     except Exception as e:
         return jsonify({'error': f'Error downloading file: {str(e)}'}), 500
 
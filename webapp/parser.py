@@ -1,34 +1,17 @@
 # SPDX-License-Identifier: Apache-2.0
 
-import xml.etree.ElementTree as ET
-from typing import Dict, Any
-import tempfile
-import os
-import json
+from typing import Dict, Any, List, Optional, Union
 from miso20022.fedwire import generate_fedwire_payload
 
-def parse_xml_message(xml_content: str, message_code: str) -> Dict[str, Any]:
+def parse_xml_message(xml_content: Union[str, bytes], message_code: Optional[str] = None) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
     """
-    Parses an ISO20022 XML message using the `generate_fedwire_payload` function,
-    which requires writing the content to a temporary file.
+    Parses an ISO20022 XML message using the `generate_fedwire_payload` function.
+    The content is parsed in memory, without writing it to a temporary file.
+    Without a message code, the message type is detected from the message itself.
+    A pacs.008 message with several transactions gives a list of payloads.
     """
-    temp_file_path = None
-    try:
-        # `generate_fedwire_payload` requires a file path.
-        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.xml', encoding='utf-8') as temp_file:
-            temp_file.write(xml_content)
-            temp_file_path = temp_file.name
+    document_payload = generate_fedwire_payload(xml_content, message_code)
+    if not document_payload:
+        raise ValueError("Failed to parse document payload. Check if the message code is correct or if the XML is valid for this message type.")
 
-        # Call the fedwire parser
-        document_payload = generate_fedwire_payload(temp_file_path, message_code)
-        if not document_payload:
-            raise ValueError("Failed to parse document payload. Check if the message code is correct or if the XML is valid for this message type.")
-
-        return document_payload
-    except Exception as e:
-        # Re-raise exceptions to be caught by the app
-        raise e
-    finally:
-        # Clean up the temporary file
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+    return document_payload
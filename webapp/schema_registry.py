@@ -0,0 +1,91 @@
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Schemas loaded once when the web application starts, so requests reference them by name.
+"""
+
+import glob
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from miso20022.fedwire import ISO20022_NAMESPACE_PREFIX, load_envelope_index
+from miso20022.validation import SCHEMA_DIR, CompiledSchema, load_schema
+
+
+def message_code_for(reference: str) -> str:
+    """Expand a schema version such as 'pacs.008.001.08' to its message code; full codes are returned as is."""
+    return reference if reference.startswith('urn:') else f"{ISO20022_NAMESPACE_PREFIX}{reference}"
+
+
+class SchemaRegistry:
+    """
+    Envelope XSDs and ISO 20022 message schemas, compiled at startup and kept in memory.
+
+    Envelopes are referenced by name (the file name without .xsd, e.g. 'fedwire_funds'),
+    message schemas by version ('pacs.008.001.08') or by full message code.
+    """
+
+    def __init__(self, schema_dir: str = SCHEMA_DIR, envelope_paths: Iterable[str] = ()):
+        self.schema_dir = schema_dir
+        # Envelope name -> (path, message code -> envelope tuple)
+        self.envelopes: Dict[str, Tuple[str, Dict[str, Tuple[str, str, str, str]]]] = {}
+        # Message code -> compiled schema
+        self.schemas: Dict[str, CompiledSchema] = {}
+
+        for path in envelope_paths:
+            name = os.path.splitext(os.path.basename(path))[0]
+            if name in self.envelopes:
+                raise ValueError(f"Duplicate envelope name '{name}' for {path}")
+            self.envelopes[name] = (path, load_envelope_index(path))
+
+        # Compiled through the process-wide cache that validate=True uses
+        for path in sorted(glob.glob(os.path.join(schema_dir, '*.xsd'))):
+            version = os.path.splitext(os.path.basename(path))[0]
+            self.schemas[message_code_for(version)] = load_schema(path)
+
+    @classmethod
+    def from_config(cls, config) -> "SchemaRegistry":
+        """
+        Build the registry from the Flask configuration.
+
+        Args:
+            config: Mapping with SCHEMA_DIR (directory of ISO 20022 XSD files) and
+                ENVELOPE_XSD (envelope XSD paths separated by os.pathsep; may be empty).
+
+        Returns:
+            The loaded SchemaRegistry.
+        """
+        envelope_paths = [path for path in (config.get('ENVELOPE_XSD') or '').split(os.pathsep) if path]
+        return cls(config.get('SCHEMA_DIR') or SCHEMA_DIR, envelope_paths)
+
+    def envelope_path(self, name: Optional[str], message_code: str) -> str:
+        """
+        Return the path of a registered envelope XSD that defines the message code.
+
+        Args:
+            name: The envelope name. May be omitted when a single envelope is registered.
+            message_code: The ISO20022 message code to generate.
+
+        Returns:
+            The envelope XSD path; its compiled index is already cached in memory.
+
+        Raises:
+            ValueError: If the envelope is unknown or does not define the message code.
+        """
+        if not name:
+            if len(self.envelopes) != 1:
+                raise ValueError(f"Envelope name is required; available: {', '.join(sorted(self.envelopes)) or 'none'}")
+            name = next(iter(self.envelopes))
+        if name not in self.envelopes:
+            raise ValueError(f"Unknown envelope '{name}'; available: {', '.join(sorted(self.envelopes)) or 'none'}")
+        path, index = self.envelopes[name]
+        if message_code not in index:
+            raise ValueError(f"Message code '{message_code}' not found in envelope '{name}'")
+        return path
+
+    def describe(self) -> Dict[str, Any]:
+        """Return the registered envelopes with their message codes, and the schema versions."""
+        return {
+            'envelopes': {name: sorted(index) for name, (_, index) in self.envelopes.items()},
+            'schemas': sorted(code[len(ISO20022_NAMESPACE_PREFIX):] for code in self.schemas),
+        }